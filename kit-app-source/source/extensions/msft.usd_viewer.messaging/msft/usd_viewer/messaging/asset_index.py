@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import bisect
+import typing
+
+from pxr import Sdf, Tf, Usd
+
+import carb
+import carb.events
+import omni.usd
+
+DATA_ATTRIBUTE_NAME = "asset_id"
+# Number of resolved owners memoized before the memo is emptied.
+OWNER_CACHE_SIZE = 100000
+# Unloaded prims are indexed too, so the assets of a partially loaded stage
+# can be found and loaded.
+INDEX_PREDICATE = Usd.PrimIsActive & Usd.PrimIsDefined & ~Usd.PrimIsAbstract
+
+
+class AssetIndex:
+    """Two-way index between asset ids and the prim paths tagged with them.
+
+    The index is built once per stage, when its assets have loaded, and is
+    kept current through `Usd.Notice.ObjectsChanged` so lookups never need
+    to traverse the stage.
+    """
+    def __init__(self):
+        self._path_by_asset_id: typing.Dict[str, str] = {}
+        self._asset_id_by_path: typing.Dict[str, str] = {}
+        # Tagged prim paths in order, the paths of a subtree are contiguous.
+        self._sorted_paths: typing.List[str] = []
+        # Memoized path of the nearest tagged ancestor, or None, of any prim.
+        self._owner_by_path: typing.Dict[str, typing.Union[str, None]] = {}
+        self._stage_id: int = 0
+        self._is_built: bool = False
+        self._stage_listener = None
+
+        # Internal messaging state
+        self._subscriptions = []
+
+        # -- subscribe to stage events
+        event_stream = omni.usd.get_context().get_stage_event_stream()
+        self._subscriptions.append(
+            event_stream.create_subscription_to_pop(self._on_stage_event)
+        )
+
+    def _on_stage_event(self, event: carb.events.IEvent) -> None:
+        if event.type in (int(omni.usd.StageEventType.OPENING), int(omni.usd.StageEventType.CLOSED)):
+            self._clear()
+            return
+
+        if event.type == int(omni.usd.StageEventType.ASSETS_LOADED):
+            # Assets can load more than once per stage, the change notices
+            # keep the index current after the first build.
+            self._ensure_built()
+            return
+
+    def get_prim_path(self, asset_id: str) -> typing.Union[str, None]:
+        """Return the path of the prim tagged with `asset_id`, or None."""
+        self._ensure_built()
+        return self._path_by_asset_id.get(asset_id)
+
+    def get_asset_id(self, prim_path: str) -> typing.Union[str, None]:
+        """Return the asset id of the prim at `prim_path`, or None if the prim is not tagged."""
+        self._ensure_built()
+        return self._asset_id_by_path.get(prim_path)
+
+    def get_owning_prim_path(self, prim_path: str) -> typing.Union[str, None]:
+        """
+        Return the path of the tagged prim that owns `prim_path`: the prim
+        itself or its nearest tagged ancestor. Returns None if there is none.
+        """
+        self._ensure_built()
+        if prim_path in self._owner_by_path:
+            return self._owner_by_path[prim_path]
+
+        owner = None
+        # Prefixes are ordered from the root down to the prim itself.
+        for prefix in reversed(Sdf.Path(prim_path).GetPrefixes()):
+            if prefix.pathString in self._asset_id_by_path:
+                owner = prefix.pathString
+                break
+
+        if len(self._owner_by_path) >= OWNER_CACHE_SIZE:
+            self._owner_by_path.clear()
+        self._owner_by_path[prim_path] = owner
+        return owner
+
+    def get_prim_paths(self) -> typing.List[str]:
+        """Return the paths of every tagged prim."""
+        self._ensure_built()
+        return list(self._asset_id_by_path)
+
+    def rebuild(self) -> None:
+        """Index every tagged prim of the current stage."""
+        self._clear()
+        context = omni.usd.get_context()
+        stage = context.get_stage()
+        if not stage:
+            return
+
+        self._stage_id = context.get_stage_id()
+        self._index_subtree(stage.GetPseudoRoot(), insort=False)
+        self._sorted_paths = sorted(self._asset_id_by_path)
+        self._stage_listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+        self._is_built = True
+        carb.log_info(f"Indexed {len(self._asset_id_by_path)} prims with a {DATA_ATTRIBUTE_NAME} attribute.")
+
+    def _ensure_built(self) -> None:
+        context = omni.usd.get_context()
+        if not self._is_built or self._stage_id != context.get_stage_id():
+            self.rebuild()
+
+    def _clear(self) -> None:
+        if self._stage_listener:
+            self._stage_listener.Revoke()
+            self._stage_listener = None
+        self._path_by_asset_id.clear()
+        self._asset_id_by_path.clear()
+        self._sorted_paths.clear()
+        self._owner_by_path.clear()
+        self._stage_id = 0
+        self._is_built = False
+
+    def _index_subtree(self, prim: Usd.Prim, insort: bool = True) -> None:
+        for descendant in Usd.PrimRange(prim, INDEX_PREDICATE):
+            self._index_prim(descendant, insort)
+
+    def _index_prim(self, prim: Usd.Prim, insort: bool = True) -> None:
+        attribute = prim.GetAttribute(DATA_ATTRIBUTE_NAME)
+        if not attribute:
+            return
+        asset_id = attribute.Get()
+        if not asset_id:
+            return
+        prim_path = prim.GetPath().pathString
+        if insort and prim_path not in self._asset_id_by_path:
+            bisect.insort(self._sorted_paths, prim_path)
+        self._asset_id_by_path[prim_path] = asset_id
+        self._owner_by_path.clear()
+        # When several prims share an asset id the first one indexed wins,
+        # matching the previous traversal based lookup.
+        self._path_by_asset_id.setdefault(asset_id, prim_path)
+
+    def _remove_path(self, prim_path: str) -> None:
+        if self._unindex_path(prim_path):
+            index = bisect.bisect_left(self._sorted_paths, prim_path)
+            del self._sorted_paths[index]
+
+    def _unindex_path(self, prim_path: str) -> bool:
+        """Remove `prim_path` from the lookups, but not from the sorted paths. Returns True if it was indexed."""
+        asset_id = self._asset_id_by_path.pop(prim_path, None)
+        if asset_id is None:
+            return False
+        self._owner_by_path.clear()
+        if self._path_by_asset_id.get(asset_id) == prim_path:
+            del self._path_by_asset_id[asset_id]
+        return True
+
+    def _remove_subtree(self, prim_path: str) -> None:
+        if prim_path == Sdf.Path.absoluteRootPath.pathString:
+            self._path_by_asset_id.clear()
+            self._asset_id_by_path.clear()
+            self._sorted_paths.clear()
+            self._owner_by_path.clear()
+            return
+        self._remove_path(prim_path)
+        # Descendant paths sort between "<path>/" and "<path>0", "0" being
+        # the character following "/".
+        start = bisect.bisect_left(self._sorted_paths, prim_path + "/")
+        end = bisect.bisect_left(self._sorted_paths, prim_path + "0", start)
+        for path in self._sorted_paths[start:end]:
+            self._unindex_path(path)
+        del self._sorted_paths[start:end]
+
+    def _reindex_prim(self, stage: Usd.Stage, prim_path: Sdf.Path) -> None:
+        self._remove_path(prim_path.pathString)
+        prim = stage.GetPrimAtPath(prim_path)
+        if prim:
+            self._index_prim(prim)
+
+    def _on_objects_changed(self, notice: Usd.Notice.ObjectsChanged, stage: Usd.Stage) -> None:
+        """Update the entries of the prims touched by a USD change."""
+        # Resyncs nested in another resync of the notice are covered by it.
+        for path in Sdf.Path.RemoveDescendentPaths(notice.GetResyncedPaths()):
+            if path.IsPropertyPath():
+                # Only the creation or removal of the asset id attribute matters.
+                if path.name == DATA_ATTRIBUTE_NAME:
+                    self._reindex_prim(stage, path.GetPrimPath())
+                continue
+            self._remove_subtree(path.pathString)
+            prim = stage.GetPrimAtPath(path)
+            if prim:
+                self._index_subtree(prim)
+
+        for path in notice.GetChangedInfoOnlyPaths():
+            if path.IsPropertyPath() and path.name == DATA_ATTRIBUTE_NAME:
+                self._reindex_prim(stage, path.GetPrimPath())
+
+    def on_shutdown(self) -> None:
+        """Clean up subscriptions and the index."""
+        self._subscriptions.clear()
+        self._clear()
@@ -19,11 +19,26 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import typing
+
+from .asset_index import AssetIndex
+from .outbox import MessageOutbox
+from .payload_loading import PayloadManager
+from .scheduler import FrameScheduler
 from .stage_loading import LoadingManager
 from .stage_management import StageManager
 from .stage_status import StatusManager
+from .status_ingestion import StatusIngestion, create_status_source
+import carb
 import omni.ext
 
+_extension_instance: typing.Union["Extension", None] = None
+
+
+def get_instance() -> typing.Union["Extension", None]:
+    """Return the enabled extension, None when it is disabled."""
+    return _extension_instance
+
 
 # Any class derived from `omni.ext.IExt` in top level module (defined in
 # `python.modules` of `extension.toml`) will be instantiated when extension
@@ -34,15 +49,39 @@ class Extension(omni.ext.IExt):
     messaging managers"""
     def on_startup(self):
         """This is called every time the extension is activated."""
+        global _extension_instance
+        # Shared stage state
+        self._asset_index: AssetIndex = AssetIndex()
+        self._outbox: MessageOutbox = MessageOutbox()
+        self._scheduler: FrameScheduler = FrameScheduler()
+        self._payloads: PayloadManager = PayloadManager()
+
         # Internal messaging state
-        self._loading_manager: LoadingManager = LoadingManager()
-        self._stage_manager: StageManager = StageManager()
-        self._status_manager: StatusManager = StatusManager()
+        self._loading_manager: LoadingManager = LoadingManager(outbox=self._outbox)
+        self._stage_manager: StageManager = StageManager(
+            asset_index=self._asset_index, outbox=self._outbox, scheduler=self._scheduler, payloads=self._payloads
+        )
+        self._status_manager: StatusManager = StatusManager(
+            asset_index=self._asset_index, outbox=self._outbox, scheduler=self._scheduler, payloads=self._payloads
+        )
+
+        # Status updates received outside of the livestream
+        self._status_ingestion: StatusIngestion = StatusIngestion(status_manager=self._status_manager)
+        source = create_status_source()
+        if source:
+            self._status_ingestion.start(source)
+        _extension_instance = self
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated. It is used to
         clean up the extension state."""
+        global _extension_instance
+        _extension_instance = None
         # Resetting the state.
+        if self._status_ingestion:
+            carb.log_info(f"Status ingestion counters: {self._status_ingestion.stats}")
+            self._status_ingestion.on_shutdown()
+            self._status_ingestion = None
         if self._loading_manager:
             self._loading_manager.on_shutdown()
             self._loading_manager = None
@@ -52,3 +91,18 @@ class Extension(omni.ext.IExt):
         if self._status_manager:
             self._status_manager.on_shutdown()
             self._status_manager = None
+        if self._payloads:
+            carb.log_info(f"Payload loading counters: {self._payloads.stats}")
+            self._payloads.on_shutdown()
+            self._payloads = None
+        if self._scheduler:
+            carb.log_info(f"Scheduler counters: {self._scheduler.stats}")
+            self._scheduler.on_shutdown()
+            self._scheduler = None
+        if self._asset_index:
+            self._asset_index.on_shutdown()
+            self._asset_index = None
+        if self._outbox:
+            carb.log_info(f"Outgoing message counters: {self._outbox.stats}")
+            self._outbox.on_shutdown()
+            self._outbox = None
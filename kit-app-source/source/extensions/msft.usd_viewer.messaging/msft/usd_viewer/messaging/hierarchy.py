@@ -0,0 +1,168 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import functools
+import typing
+
+from pxr import Tf, Usd, UsdGeom
+
+from .scheduler import Work, run_to_completion
+
+# Filter names accepted from the client and the schema they select.
+FILTER_TYPES = {
+    "USDGeom": UsdGeom.Mesh,
+    "mesh": UsdGeom.Mesh,
+    "xform": UsdGeom.Xform,
+    "scope": UsdGeom.Scope,
+}
+# Number of prims visited between two yields of `HierarchyWalker.iter_tree`.
+STEP_SIZE = 64
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_type_filter(filters: typing.Tuple[str, ...]) -> typing.FrozenSet[str]:
+    type_names = set()
+    for filt in filters:
+        if filt not in FILTER_TYPES:
+            continue
+        tf_type = Tf.Type.Find(FILTER_TYPES[filt])
+        # Include derived schemas so the set matches `Usd.Prim.IsA`.
+        for schema_type in (tf_type, *tf_type.GetAllDerivedTypes()):
+            type_name = Usd.SchemaRegistry.GetSchemaTypeName(schema_type)
+            if type_name:
+                type_names.add(type_name)
+    return frozenset(type_names)
+
+
+def compile_type_filter(filters: typing.Union[typing.Iterable[str], None]) -> typing.Union[typing.FrozenSet[str], None]:
+    """
+    Compile client filter names to the set of prim type names that pass
+    them. Returns None when nothing is filtered.
+    """
+    if filters is None:
+        return None
+    return _compile_type_filter(tuple(filters))
+
+
+def has_children(prim: Usd.Prim) -> bool:
+    """Return True if `prim` has any child, without creating the child prims."""
+    # Listing the names is several times cheaper than creating a range.
+    return bool(prim.GetChildrenNames())
+
+
+class HierarchyWalker:
+    """
+    Enumerates the descendants of a prim on a `Usd.PrimRange`.
+
+    Descendants deeper than `max_depth` levels below the direct children,
+    failing the type filter, or belonging to the application (cameras and
+    render settings) are pruned along with their subtree.
+    """
+    def __init__(self, filters: typing.Union[typing.Iterable[str], None] = None, max_depth: int = 0):
+        self._type_names = compile_type_filter(filters)
+        self._max_depth = max_depth
+
+    def accepts(self, prim: Usd.Prim, is_root_child: bool = False) -> bool:
+        """Return True if `prim` passes the filters. `is_root_child` is True for children of the pseudo-root."""
+        return self._accepts(prim, prim.GetName(), is_root_child)
+
+    def _accepts(self, prim: Usd.Prim, name: str, is_root_child: bool) -> bool:
+        if self._type_names is not None and prim.GetTypeName() not in self._type_names:
+            return False
+        # Skipping over cameras
+        if name.startswith('OmniverseKit_'):
+            return False
+        # Also skipping rendering primitives.
+        if is_root_child and name == 'Render':
+            return False
+        return True
+
+    def walk(self, prim: Usd.Prim) -> typing.Iterator[typing.Tuple[Usd.Prim, int]]:
+        """Yield every accepted descendant of `prim` with its depth, in depth-first order."""
+        is_root = prim.IsPseudoRoot()
+        prim_range = Usd.PrimRange.PreAndPostVisit(prim)
+        iterator = iter(prim_range)
+        next(iterator)  # Skip `prim` itself.
+        depth = 0
+        for descendant in iterator:
+            if iterator.IsPostVisit():
+                depth -= 1
+                if depth < 0:
+                    return
+                continue
+            if not self.accepts(descendant, is_root and depth == 0):
+                iterator.PruneChildren()
+            else:
+                yield descendant, depth
+                if depth >= self._max_depth:
+                    iterator.PruneChildren()
+            depth += 1
+
+    def walk_tree(self, prim: Usd.Prim) -> typing.List[dict]:
+        """
+        Return the accepted descendants of `prim` as nested `{name, path, children}` dictionaries.
+
+        `children` is only set on prims that have children, and is an empty
+        list on prims at the depth limit so clients can lazy load them.
+        """
+        return run_to_completion(self.iter_tree(prim))
+
+    def iter_tree(self, prim: Usd.Prim) -> Work:
+        """Resumable `walk_tree`, yielding every `STEP_SIZE` visited prims."""
+        is_root = prim.IsPseudoRoot()
+        root_children: typing.List[dict] = []
+        # Info of every prim being visited, None for the pruned ones. Paths
+        # are composed from the parent path rather than queried per prim.
+        root_path = "" if is_root else prim.GetPath().pathString
+        stack: typing.List[typing.Union[dict, None]] = [{"path": root_path, "children": root_children}]
+        prim_range = Usd.PrimRange.PreAndPostVisit(prim)
+        iterator = iter(prim_range)
+        next(iterator)  # Skip `prim` itself.
+        visited = 0
+        for descendant in iterator:
+            visited += 1
+            if visited % STEP_SIZE == 0:
+                yield None
+            if iterator.IsPostVisit():
+                stack.pop()
+                if not stack:
+                    break
+                continue
+            depth = len(stack) - 1
+            parent = stack[-1]
+            if parent is not None and "children" not in parent:
+                parent["children"] = []
+
+            name = descendant.GetName()
+            if not self._accepts(descendant, name, is_root and depth == 0):
+                iterator.PruneChildren()
+                stack.append(None)
+                continue
+
+            info = {"name": name, "path": f"{parent['path']}/{name}"}
+            parent["children"].append(info)
+            stack.append(info)
+            if depth >= self._max_depth:
+                iterator.PruneChildren()
+                if has_children(descendant):
+                    info["children"] = []
+
+        return root_children
@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import json
+import os
+import time
+import typing
+
+from pxr import Usd, UsdUtils
+
+import carb
+import carb.settings
+import carb.tokens
+
+PATH_SETTING = "/exts/msft.usd_viewer.messaging/metrics/path"
+FORMAT_SETTING = "/exts/msft.usd_viewer.messaging/metrics/format"
+MAX_BYTES_SETTING = "/exts/msft.usd_viewer.messaging/metrics/max_bytes"
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+METRIC_PREFIX = "usd_viewer_stage_load"
+
+# Load events, in order, whose timestamps delimit the reported durations.
+LOAD_EVENTS = ("requested", "opening", "opened", "assets_loaded", "streaming_idle", "sent")
+
+
+def compute_durations(timestamps: typing.Dict[str, float]) -> typing.Dict[str, float]:
+    """
+    Return the milliseconds between consecutive load events of `timestamps`,
+    keyed `<from>_to_<to>`, and the `total` from the first to the last one.
+    """
+    events = [o for o in LOAD_EVENTS if o in timestamps]
+    durations = {
+        f"{a}_to_{b}": round((timestamps[b] - timestamps[a]) * 1000, 3) for a, b in zip(events, events[1:])
+    }
+    if len(events) > 1:
+        durations["total"] = round((timestamps[events[-1]] - timestamps[events[0]]) * 1000, 3)
+    return durations
+
+
+def compute_stage_counts(stage: typing.Union[Usd.Stage, None]) -> typing.Dict[str, int]:
+    """Return the `prim_count` and `layer_count` of `stage`, -1 where they can't be computed."""
+    counts = {"prim_count": -1, "layer_count": -1}
+    if not stage:
+        return counts
+    counts["layer_count"] = len(stage.GetUsedLayers())
+    try:
+        stats = UsdUtils.ComputeUsdStageStats(stage)
+        # The stage overload returns the prim count along with the statistics.
+        if isinstance(stats, tuple):
+            stats = stats[1]
+        counts["prim_count"] = int(stats.get("totalPrimCount", -1))
+    except Exception as e:
+        carb.log_warn(f"Failed to count the prims of the stage: {e}")
+    return counts
+
+
+class LoadMetricsWriter:
+    """
+    Records stage load metrics to a local file for node exporters.
+
+    The `jsonl` format appends a JSON object per load and rolls the file
+    over to `<path>.1` beyond `max_bytes`. The `prometheus` format rewrites
+    the file with the last load for the node exporter textfile collector.
+    No file is written when `path` is empty.
+    """
+    def __init__(
+        self,
+        path: typing.Union[str, None] = None,
+        format: typing.Union[str, None] = None,
+        max_bytes: typing.Union[int, None] = None,
+    ):
+        settings = carb.settings.get_settings()
+        if path is None:
+            path = settings.get_as_string(PATH_SETTING)
+        self._path: str = carb.tokens.get_tokens_interface().resolve(path) if path else ""
+        self._format: str = (format or settings.get_as_string(FORMAT_SETTING) or "jsonl").lower()
+        if max_bytes is None:
+            max_bytes = settings.get_as_int(MAX_BYTES_SETTING) or DEFAULT_MAX_BYTES
+        self._max_bytes: int = max_bytes
+        self._load_counts: typing.Dict[str, int] = {}
+
+    @property
+    def path(self) -> str:
+        """The resolved path of the metrics file."""
+        return self._path
+
+    def write(self, metrics: dict) -> None:
+        """Record the `metrics` of a load."""
+        result = metrics.get("result", "")
+        self._load_counts[result] = self._load_counts.get(result, 0) + 1
+        if not self._path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            if self._format == "prometheus":
+                self._write_prometheus(metrics)
+            else:
+                self._write_jsonl(metrics)
+        except OSError as e:
+            carb.log_warn(f"Failed to write stage load metrics to '{self._path}': {e}")
+
+    def _write_jsonl(self, metrics: dict) -> None:
+        if os.path.exists(self._path) and os.path.getsize(self._path) >= self._max_bytes:
+            os.replace(self._path, self._path + ".1")
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), **metrics}) + "\n")
+
+    def _write_prometheus(self, metrics: dict) -> None:
+        lines = [
+            f"# HELP {METRIC_PREFIX}_duration_ms Milliseconds between the events of the last stage load.",
+            f"# TYPE {METRIC_PREFIX}_duration_ms gauge",
+        ]
+        lines.extend(
+            f'{METRIC_PREFIX}_duration_ms{{phase="{k}"}} {v}' for k, v in metrics.get("durations_ms", {}).items()
+        )
+        lines.extend([
+            f"# HELP {METRIC_PREFIX}_prims Number of prims of the last loaded stage.",
+            f"# TYPE {METRIC_PREFIX}_prims gauge",
+            f"{METRIC_PREFIX}_prims {metrics.get('prim_count', -1)}",
+            f"# HELP {METRIC_PREFIX}_layers Number of layers used by the last loaded stage.",
+            f"# TYPE {METRIC_PREFIX}_layers gauge",
+            f"{METRIC_PREFIX}_layers {metrics.get('layer_count', -1)}",
+            f"# HELP {METRIC_PREFIX}s_total Number of stage loads by result.",
+            f"# TYPE {METRIC_PREFIX}s_total counter",
+        ])
+        lines.extend(f'{METRIC_PREFIX}s_total{{result="{k}"}} {v}' for k, v in self._load_counts.items())
+        # Written aside and renamed so a scrape never reads a partial file.
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self._path)
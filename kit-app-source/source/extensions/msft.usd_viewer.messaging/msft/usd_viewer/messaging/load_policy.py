@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import typing
+
+from pxr import Sdf, Usd
+
+import carb
+import omni.usd
+
+from .asset_index import DATA_ATTRIBUTE_NAME, INDEX_PREDICATE
+from .pickability import minimal_roots
+
+LOAD_MODES = ("all", "none")
+
+
+def find_asset_prim_paths(stage: Usd.Stage, asset_ids: typing.Iterable[str]) -> typing.Dict[str, str]:
+    """Return the path of the prim tagged with every asset id found, unloaded prims included."""
+    remaining = set(asset_ids)
+    prim_paths: typing.Dict[str, str] = {}
+    if not remaining:
+        return prim_paths
+    for prim in Usd.PrimRange(stage.GetPseudoRoot(), INDEX_PREDICATE):
+        attribute = prim.GetAttribute(DATA_ATTRIBUTE_NAME)
+        if not attribute:
+            continue
+        asset_id = attribute.Get()
+        if asset_id in remaining:
+            prim_paths[asset_id] = prim.GetPath().pathString
+            remaining.discard(asset_id)
+            if not remaining:
+                break
+    return prim_paths
+
+
+class LoadPolicy:
+    """
+    How much of a stage is loaded when it opens.
+
+    `mode` is `all` to load every payload, or `none` to load only the
+    subtrees of `prim_paths` and of the prims tagged with `asset_ids`.
+    A non-empty `population_mask` lists the only prim paths composed.
+    """
+    def __init__(
+        self,
+        mode: str = "all",
+        prim_paths: typing.Iterable[str] = (),
+        asset_ids: typing.Iterable[str] = (),
+        population_mask: typing.Iterable[str] = (),
+    ):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Invalid load mode '{mode}', expected one of {', '.join(LOAD_MODES)}")
+        self.mode: str = mode
+        self.prim_paths: typing.Tuple[str, ...] = tuple(minimal_roots(prim_paths))
+        self.asset_ids: typing.Tuple[str, ...] = tuple(sorted(set(asset_ids)))
+        self.population_mask: typing.Tuple[str, ...] = tuple(minimal_roots(population_mask))
+        for prim_path in (*self.prim_paths, *self.population_mask):
+            if not Sdf.Path.IsValidPathString(prim_path) or not Sdf.Path(prim_path).IsAbsolutePath():
+                raise ValueError(f"Invalid prim path '{prim_path}'")
+
+    @classmethod
+    def from_dict(cls, policy: typing.Union[dict, None]) -> "LoadPolicy":
+        """Create the policy described by a `load` request payload or settings dictionary."""
+        if not policy:
+            return cls()
+        return cls(
+            mode=policy.get("mode") or "all",
+            prim_paths=policy.get("prim_paths") or (),
+            asset_ids=policy.get("asset_ids") or (),
+            population_mask=policy.get("population_mask") or (),
+        )
+
+    def _key(self) -> tuple:
+        return self.mode, self.prim_paths, self.asset_ids, self.population_mask
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LoadPolicy) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return (
+            f"LoadPolicy(mode={self.mode!r}, prim_paths={list(self.prim_paths)}, "
+            f"asset_ids={list(self.asset_ids)}, population_mask={list(self.population_mask)})"
+        )
+
+    @property
+    def is_default(self) -> bool:
+        """True if the whole stage is loaded."""
+        return self.mode == "all" and not self.population_mask
+
+    @property
+    def initial_load_set(self) -> omni.usd.UsdContextInitialLoadSet:
+        """The load set to open the stage with."""
+        if self.mode == "all":
+            return omni.usd.UsdContextInitialLoadSet.LOAD_ALL
+        return omni.usd.UsdContextInitialLoadSet.LOAD_NONE
+
+    def open_masked(self, url: str) -> Usd.Stage:
+        """Open the stage at `url` composing only the population mask. Safe to call from a worker thread."""
+        mask = Usd.StagePopulationMask(self.population_mask)
+        load = Usd.Stage.LoadAll if self.mode == "all" else Usd.Stage.LoadNone
+        stage = Usd.Stage.OpenMasked(url, mask, load)
+        if not stage:
+            raise RuntimeError(f"Failed to open '{url}'")
+        return stage
+
+    def apply(self, stage: Usd.Stage) -> typing.List[str]:
+        """
+        Load the subtrees selected by the policy on a stage opened with
+        `initial_load_set`. Returns the paths loaded.
+        """
+        if self.mode == "all":
+            return []
+        prim_paths = list(self.prim_paths)
+        found = find_asset_prim_paths(stage, self.asset_ids)
+        missing = [o for o in self.asset_ids if o not in found]
+        if missing:
+            carb.log_warn(f"No prim found to load for {DATA_ATTRIBUTE_NAME}s: {missing}")
+        prim_paths = minimal_roots([*prim_paths, *found.values()])
+        prim_paths = [o for o in prim_paths if stage.GetPrimAtPath(o)]
+        if prim_paths:
+            stage.LoadAndUnload([Sdf.Path(o) for o in prim_paths], [], Usd.LoadWithDescendants)
+        carb.log_info(f"Loaded {len(prim_paths)} subtrees of the stage per {self}")
+        return prim_paths
@@ -0,0 +1,156 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import enum
+import time
+import typing
+
+import carb
+import carb.settings
+
+TIMEOUT_SETTING = "/exts/msft.usd_viewer.messaging/load_timeout/{phase}"
+DEFAULT_TIMEOUTS = {
+    "opened": 300.0,
+    "assets_loaded": 600.0,
+    "streaming_idle": 300.0,
+}
+
+
+class LoadPhase(enum.IntEnum):
+    """Phases of a stage load, in the order they complete."""
+    IDLE = 0
+    OPENING = 1
+    OPENED = 2
+    ASSETS_LOADED = 3
+    STREAMING_IDLE = 4
+
+
+class LoadError(Exception):
+    """Raised while waiting on a load that failed, timed out or was superseded."""
+
+
+class LoadStateMachine:
+    """
+    Tracks a stage load from `OPENING` to `STREAMING_IDLE`.
+
+    Phases are advanced by the stage and streaming status events, and
+    awaited with `wait_for`, so nothing polls the load every frame.
+    """
+    def __init__(self):
+        self._phase: LoadPhase = LoadPhase.IDLE
+        self._futures: typing.Dict[LoadPhase, asyncio.Future] = {}
+        self._phase_times: typing.Dict[LoadPhase, float] = {}
+        self._is_streaming_busy: bool = False
+
+    @property
+    def phase(self) -> LoadPhase:
+        """The last phase reached."""
+        return self._phase
+
+    @property
+    def phase_timestamps(self) -> typing.Dict[str, float]:
+        """`time.perf_counter` of every phase reached."""
+        return {phase.name.lower(): t for phase, t in self._phase_times.items()}
+
+    @property
+    def phase_times(self) -> typing.Dict[str, float]:
+        """Seconds from `OPENING` to every phase reached."""
+        start = self._phase_times.get(LoadPhase.OPENING)
+        if start is None:
+            return {}
+        return {phase.name.lower(): t - start for phase, t in self._phase_times.items() if phase > LoadPhase.OPENING}
+
+    @staticmethod
+    def get_timeout(phase: LoadPhase) -> float:
+        """Return the seconds allowed to reach `phase` from the previous one."""
+        name = phase.name.lower()
+        timeout = carb.settings.get_settings().get_as_float(TIMEOUT_SETTING.format(phase=name))
+        return timeout if timeout > 0 else DEFAULT_TIMEOUTS[name]
+
+    def begin(self) -> None:
+        """Start tracking a new load, failing the waiters of the previous one."""
+        self._fail_waiters(LoadError("Superseded by a new stage load"))
+        loop = asyncio.get_event_loop()
+        self._futures = {o: loop.create_future() for o in LoadPhase if o > LoadPhase.OPENING}
+        self._phase_times = {}
+        self._phase = LoadPhase.IDLE
+        self._advance(LoadPhase.OPENING)
+
+    def advance(self, phase: LoadPhase) -> None:
+        """Record that `phase` was reached, ignored when no load is tracked."""
+        if self._phase == LoadPhase.IDLE or phase <= self._phase:
+            return
+        self._advance(phase)
+        # Streaming may have gone idle before the assets finished loading.
+        if phase == LoadPhase.ASSETS_LOADED and not self._is_streaming_busy:
+            self._advance(LoadPhase.STREAMING_IDLE)
+
+    def set_streaming_busy(self, is_busy: bool) -> None:
+        """Record the state of the RTX streaming manager."""
+        self._is_streaming_busy = is_busy
+        if not is_busy and self._phase == LoadPhase.ASSETS_LOADED:
+            self._advance(LoadPhase.STREAMING_IDLE)
+
+    def fail(self, error: str) -> None:
+        """Stop tracking the load, failing its waiters with `error`."""
+        self._fail_waiters(LoadError(error))
+        self._phase = LoadPhase.IDLE
+
+    def reset(self) -> None:
+        """Stop tracking the load."""
+        self.fail("Load tracking was reset")
+
+    async def wait_for(self, phase: LoadPhase, timeout: typing.Union[float, None] = None) -> None:
+        """
+        Wait until `phase` is reached. Raises `LoadError` if the load fails,
+        is superseded, or doesn't reach `phase` within `timeout` seconds.
+        """
+        future = self._futures.get(phase)
+        if future is None:
+            raise LoadError("No stage load is being tracked")
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise LoadError(
+                f"Timed out after {timeout:.0f} s waiting for the stage to reach {phase.name.lower()} "
+                f"(reached {self._phase.name.lower()})"
+            ) from None
+
+    def _advance(self, phase: LoadPhase) -> None:
+        now = time.perf_counter()
+        for o in LoadPhase:
+            if self._phase < o <= phase:
+                self._phase_times[o] = now
+                future = self._futures.get(o)
+                if future and not future.done():
+                    future.set_result(None)
+        self._phase = phase
+        carb.log_info(f"Stage load reached {phase.name.lower()}.")
+
+    def _fail_waiters(self, error: LoadError) -> None:
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(error)
+                # Mark the exception retrieved for futures nobody awaits.
+                future.exception()
+        self._futures = {}
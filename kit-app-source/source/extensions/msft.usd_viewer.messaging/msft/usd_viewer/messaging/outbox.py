@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import typing
+
+import carb
+import carb.events
+import omni.kit.app
+
+# Messages of these types are superseded by a newer message of the same type
+# sent during the same frame.
+COALESCED_EVENT_TYPES = (
+    "stageSelectionChanged",
+    "updateProgressAmount",
+)
+
+
+class MessageOutbox:
+    """
+    Collects the outgoing livestream messages of a frame and sends them
+    with a single pump of the message bus on the next update.
+    """
+    def __init__(self, coalesced_event_types: typing.Iterable[str] = COALESCED_EVENT_TYPES):
+        self._coalesced_event_types: typing.FrozenSet[str] = frozenset(coalesced_event_types)
+        # Pending messages in send order, superseded ones are set to None.
+        self._pending: typing.List[typing.Union[typing.Tuple[str, dict], None]] = []
+        self._pending_index: typing.Dict[str, int] = {}
+
+        # Counters
+        self._sent: int = 0
+        self._coalesced: int = 0
+        self._dropped: int = 0
+        self._flushes: int = 0
+
+        self._subscription = omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+            self._on_update, name="msft.usd_viewer.messaging outbox"
+        )
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Message counters. `coalesced` counts the messages superseded by a
+        newer one, `dropped` every message that was never sent, coalesced
+        ones included.
+        """
+        return {
+            "sent": self._sent,
+            "coalesced": self._coalesced,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "pending": len(self._pending) - self._coalesced_pending(),
+        }
+
+    def send(self, event_name: str, payload: typing.Union[dict, None] = None, coalesce: bool = True) -> None:
+        """
+        Queue a message to the client. Messages of a coalesced type replace
+        the pending message of the same type unless `coalesce` is False.
+        """
+        if coalesce and event_name in self._coalesced_event_types:
+            index = self._pending_index.get(event_name)
+            if index is not None:
+                self._pending[index] = None
+                self._coalesced += 1
+                self._dropped += 1
+            self._pending_index[event_name] = len(self._pending)
+        self._pending.append((event_name, payload if payload is not None else {}))
+
+    def flush(self) -> None:
+        """Dispatch the pending messages and pump the message bus once."""
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_index.clear()
+
+        message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
+        for message in pending:
+            if message is None:
+                continue
+            event_name, payload = message
+            message_bus.dispatch(carb.events.type_from_string(event_name), payload=payload)
+            self._sent += 1
+        message_bus.pump()
+        self._flushes += 1
+
+    def _coalesced_pending(self) -> int:
+        return sum(1 for o in self._pending if o is None)
+
+    def _on_update(self, event: carb.events.IEvent) -> None:
+        self.flush()
+
+    def on_shutdown(self) -> None:
+        """Discard the pending messages and stop flushing."""
+        self._subscription = None
+        dropped = len(self._pending) - self._coalesced_pending()
+        if dropped:
+            carb.log_warn(f"Dropping {dropped} messages that were not sent before shutdown.")
+        self._dropped += dropped
+        self._pending.clear()
+        self._pending_index.clear()
+
+
+class ThrottledSender:
+    """
+    Sends messages of one type through a `MessageOutbox` at most `max_hz`
+    times per second. Messages sent within an interval are held and only
+    the latest one is sent once the interval ends.
+    """
+    def __init__(self, outbox: MessageOutbox, event_name: str, max_hz: float):
+        self._outbox: MessageOutbox = outbox
+        self._event_name: str = event_name
+        self._interval: float = 1 / max_hz if max_hz > 0 else 0
+        self._last_sent: float = 0
+        self._pending: typing.Union[dict, None] = None
+
+        # Counters
+        self._sent: int = 0
+        self._throttled: int = 0
+
+        self._subscription = omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+            self._on_update, name=f"msft.usd_viewer.messaging {event_name} throttle"
+        )
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """Message counters, `throttled` counts the messages superseded by a later one."""
+        return {"sent": self._sent, "throttled": self._throttled}
+
+    def send(self, payload: dict, force: bool = False) -> None:
+        """Send `payload`, or hold it until the interval ends. `force` sends it right away."""
+        if self._pending is not None:
+            self._throttled += 1
+        self._pending = payload
+        if force or time.monotonic() - self._last_sent >= self._interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send the held message, if any."""
+        if self._pending is None:
+            return
+        self._outbox.send(self._event_name, self._pending)
+        self._pending = None
+        self._last_sent = time.monotonic()
+        self._sent += 1
+
+    def _on_update(self, event: carb.events.IEvent) -> None:
+        if self._pending is not None and time.monotonic() - self._last_sent >= self._interval:
+            self.flush()
+
+    def on_shutdown(self) -> None:
+        """Discard the held message and stop sending."""
+        self._subscription = None
+        self._pending = None
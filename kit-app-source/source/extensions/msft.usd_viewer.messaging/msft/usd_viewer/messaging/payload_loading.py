@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import asyncio
+import collections
+import time
+import typing
+
+from pxr import Sdf, Usd
+
+import carb
+import carb.events
+import carb.settings
+import omni.kit.app
+import omni.usd
+
+from .stage_cache import get_resident_memory_mb
+
+AUTO_SETTING = "/exts/msft.usd_viewer.messaging/payload_loading/auto"
+MAX_LOADED_SETTING = "/exts/msft.usd_viewer.messaging/payload_loading/max_loaded"
+MAX_MEMORY_SETTING = "/exts/msft.usd_viewer.messaging/payload_loading/max_memory_mb"
+
+# Seconds between the memory checks of frames without payload changes.
+MEMORY_CHECK_INTERVAL = 1.0
+
+
+def is_loaded(stage: Usd.Stage, prim_path: str) -> bool:
+    """Return True if the prim at `prim_path` and every payload below it are loaded."""
+    prim = stage.GetPrimAtPath(prim_path)
+    if not prim:
+        return False
+    if not prim.IsLoaded():
+        return False
+    return all(stage.GetPrimAtPath(o).IsLoaded() for o in stage.FindLoadable(prim.GetPath()))
+
+
+class PayloadManager:
+    """
+    Loads and unloads the payloads of asset subtrees on demand.
+
+    Requests of a frame are batched into a single `stage.LoadAndUnload`
+    call on the next update, the latest request for a prim wins. Subtrees
+    loaded on demand with `pinned` False are kept in an LRU and the least
+    recently used ones are unloaded beyond `max_loaded` subtrees or while
+    the process uses more than `max_memory_mb`.
+
+    In auto mode, `StageManager` and `StatusManager` load the selected and
+    faulted assets through this manager.
+    """
+    def __init__(
+        self,
+        is_auto: typing.Union[bool, None] = None,
+        max_loaded: typing.Union[int, None] = None,
+        max_memory_mb: typing.Union[int, None] = None,
+    ):
+        settings = carb.settings.get_settings()
+        self.is_auto: bool = settings.get_as_bool(AUTO_SETTING) if is_auto is None else is_auto
+        self._max_loaded: int = settings.get_as_int(MAX_LOADED_SETTING) if max_loaded is None else max_loaded
+        self._max_memory_mb: int = settings.get_as_int(MAX_MEMORY_SETTING) if max_memory_mb is None else max_memory_mb
+
+        # Pending changes of the frame, True to load and False to unload,
+        # and the futures resolved once they are applied.
+        self._pending: typing.Dict[str, bool] = {}
+        self._futures: typing.List[asyncio.Future] = []
+        # Subtrees loaded on demand, least recently used first, and the
+        # subtrees loaded on explicit requests, which are never evicted.
+        self._loaded: collections.OrderedDict = collections.OrderedDict()
+        self._pinned: typing.Set[str] = set()
+        # Time after which an update without changes checks the memory budget.
+        self._next_memory_check: float = 0.0
+
+        # Counters
+        self._loads: int = 0
+        self._unloads: int = 0
+        self._evictions: int = 0
+        self._batches: int = 0
+
+        # Internal messaging state
+        self._subscriptions = []
+
+        self._subscriptions.append(
+            omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+                self._on_update, name="msft.usd_viewer.messaging payloads"
+            )
+        )
+        event_stream = omni.usd.get_context().get_stage_event_stream()
+        self._subscriptions.append(
+            event_stream.create_subscription_to_pop(self._on_stage_event)
+        )
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """Load, unload and eviction counters."""
+        return {
+            "loads": self._loads,
+            "unloads": self._unloads,
+            "evictions": self._evictions,
+            "batches": self._batches,
+            "loaded": len(self._loaded),
+            "pinned": len(self._pinned),
+        }
+
+    @property
+    def loaded_paths(self) -> typing.List[str]:
+        """The subtrees loaded on demand, least recently used first."""
+        return list(self._loaded)
+
+    def load(self, prim_paths: typing.Iterable[str], pinned: bool = True) -> asyncio.Future:
+        """
+        Load the subtrees of `prim_paths` with the next batch. Returns a
+        future resolved with the paths loaded once the batch is applied.
+        """
+        for prim_path in prim_paths:
+            if pinned:
+                self._pinned.add(prim_path)
+                self._loaded.pop(prim_path, None)
+            elif prim_path not in self._pinned:
+                self._loaded[prim_path] = None
+                self._loaded.move_to_end(prim_path)
+            self._pending[prim_path] = True
+        return self._create_future()
+
+    def unload(self, prim_paths: typing.Iterable[str]) -> asyncio.Future:
+        """
+        Unload the subtrees of `prim_paths` with the next batch. Returns a
+        future resolved with the paths unloaded once the batch is applied.
+        """
+        for prim_path in prim_paths:
+            self._pinned.discard(prim_path)
+            self._loaded.pop(prim_path, None)
+            self._pending[prim_path] = False
+        return self._create_future()
+
+    def touch(self, prim_paths: typing.Iterable[str]) -> None:
+        """Mark the subtrees of `prim_paths` loaded on demand as recently used."""
+        for prim_path in prim_paths:
+            if prim_path in self._loaded:
+                self._loaded.move_to_end(prim_path)
+
+    def _create_future(self) -> asyncio.Future:
+        future = asyncio.get_event_loop().create_future()
+        self._futures.append(future)
+        return future
+
+    def flush(self) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        """Apply the pending changes in one `LoadAndUnload` call. Returns the paths loaded and unloaded."""
+        pending = self._pending
+        futures = self._futures
+        self._pending = {}
+        self._futures = []
+        loaded: typing.List[str] = []
+        unloaded: typing.List[str] = []
+        stage = omni.usd.get_context().get_stage()
+        if stage:
+            self._evict(pending)
+            for prim_path, is_load in pending.items():
+                prim = stage.GetPrimAtPath(prim_path)
+                if not prim:
+                    continue
+                # Subtrees already in the requested state are left alone.
+                if is_load and not is_loaded(stage, prim_path):
+                    loaded.append(prim_path)
+                elif not is_load and prim.IsLoaded():
+                    unloaded.append(prim_path)
+            if loaded or unloaded:
+                stage.LoadAndUnload(
+                    [Sdf.Path(o) for o in loaded], [Sdf.Path(o) for o in unloaded], Usd.LoadWithDescendants
+                )
+                self._loads += len(loaded)
+                self._unloads += len(unloaded)
+                self._batches += 1
+                carb.log_info(f"Loaded {len(loaded)} and unloaded {len(unloaded)} payload subtrees.")
+        for future in futures:
+            if not future.done():
+                future.set_result((loaded, unloaded))
+        return loaded, unloaded
+
+    def _evict(self, pending: typing.Dict[str, bool]) -> None:
+        """Add the unloads of the least recently used subtrees beyond the budget to `pending`."""
+        while self._max_loaded > 0 and len(self._loaded) > self._max_loaded:
+            self._evict_oldest(pending, "capacity")
+        if self._max_memory_mb <= 0:
+            return
+        # The memory of this batch is only known on a later frame, so at most
+        # one subtree is evicted per frame and the ones just requested stay.
+        memory_mb = get_resident_memory_mb()
+        if memory_mb is None or memory_mb <= self._max_memory_mb:
+            return
+        if self._loaded and not pending.get(next(iter(self._loaded))):
+            self._evict_oldest(pending, f"memory {memory_mb:.0f} MB")
+
+    def _evict_oldest(self, pending: typing.Dict[str, bool], reason: str) -> None:
+        prim_path, _ = self._loaded.popitem(last=False)
+        pending[prim_path] = False
+        self._evictions += 1
+        carb.log_info(f"Evicting payload subtree '{prim_path}' ({reason}).")
+
+    def _clear(self) -> None:
+        self._pending.clear()
+        self._loaded.clear()
+        self._pinned.clear()
+        # Requests of the previous stage complete without any change.
+        for future in self._futures:
+            if not future.done():
+                future.set_result(([], []))
+        self._futures.clear()
+
+    def _on_update(self, event: carb.events.IEvent) -> None:
+        if self._pending or self._futures:
+            self.flush()
+        elif self._loaded and self._max_memory_mb > 0:
+            # Reading the resident memory every frame isn't worth it, it's
+            # checked at most every `MEMORY_CHECK_INTERVAL` seconds.
+            now = time.monotonic()
+            if now >= self._next_memory_check:
+                self._next_memory_check = now + MEMORY_CHECK_INTERVAL
+                self.flush()
+
+    def _on_stage_event(self, event: carb.events.IEvent) -> None:
+        if event.type in (int(omni.usd.StageEventType.OPENING), int(omni.usd.StageEventType.CLOSED)):
+            self._clear()
+
+    def on_shutdown(self) -> None:
+        """Discard the pending changes and stop loading."""
+        self._subscriptions.clear()
+        self._clear()
@@ -0,0 +1,127 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import typing
+
+import carb
+import omni.usd
+
+from .scheduler import Work, run_to_completion
+
+
+def minimal_roots(prim_paths: typing.Iterable[str]) -> typing.List[str]:
+    """Return the paths of `prim_paths` that have no ancestor in `prim_paths`."""
+    roots: typing.List[str] = []
+    # Sorting on path elements places every prim right before its descendants.
+    for prim_path in sorted(set(prim_paths), key=lambda o: o.split("/")):
+        if roots and (roots[-1] == "/" or prim_path.startswith(roots[-1] + "/")):
+            continue
+        roots.append(prim_path)
+    return roots
+
+
+def _has_ancestor(prim_path: str, prim_paths: typing.AbstractSet[str]) -> bool:
+    """Return True if one of the ancestors of `prim_path` is in `prim_paths`."""
+    if prim_path == "/":
+        return False
+    if "/" in prim_paths:
+        return True
+    index = prim_path.rfind("/")
+    while index > 0:
+        prim_path = prim_path[:index]
+        if prim_path in prim_paths:
+            return True
+        index = prim_path.rfind("/")
+    return False
+
+
+class PickabilityManager:
+    """
+    Applies viewport pickability to the stage of the USD context.
+
+    `set_pickable` applies to a prim and its whole subtree, so only the
+    minimal set of roots is made pickable. The manager remembers the
+    requested paths and only applies the roots that were added or removed.
+
+    `iter_set_pickable_paths` is a resumable version for the
+    `FrameScheduler`. Roots are tracked as they are applied, so a change
+    cancelled halfway can be superseded by another one.
+    """
+    def __init__(self):
+        self._requested_paths: typing.Set[str] = set()
+        self._pickable_roots: typing.Set[str] = set()
+
+    @property
+    def pickable_paths(self) -> typing.FrozenSet[str]:
+        """The paths requested to be pick-able."""
+        return frozenset(self._requested_paths)
+
+    def reset(self) -> None:
+        """Make the entire stage not pick-able."""
+        omni.usd.get_context().set_pickable("/", False)
+        self._requested_paths.clear()
+        self._pickable_roots.clear()
+
+    def set_pickable_paths(self, prim_paths: typing.Iterable[str]) -> None:
+        """Make exactly `prim_paths` and their descendants pick-able."""
+        run_to_completion(self.iter_set_pickable_paths(prim_paths))
+
+    def iter_set_pickable_paths(self, prim_paths: typing.Iterable[str]) -> Work:
+        """Resumable `set_pickable_paths`, yielding after every root."""
+        return self._apply(set(prim_paths))
+
+    def make_pickable(self, prim_paths: typing.Iterable[str]) -> None:
+        """Make `prim_paths` and their descendants pick-able."""
+        run_to_completion(self._apply(self._requested_paths.union(prim_paths)))
+
+    def make_unpickable(self, prim_paths: typing.Iterable[str]) -> None:
+        """Stop making `prim_paths` pick-able. They remain pick-able if one of their ancestors is."""
+        run_to_completion(self._apply(self._requested_paths.difference(prim_paths)))
+
+    def _apply(self, requested_paths: typing.Set[str]) -> Work:
+        start = time.perf_counter()
+        context = omni.usd.get_context()
+        roots = set(minimal_roots(requested_paths))
+        self._requested_paths = requested_paths
+        removed = self._pickable_roots - roots
+        added = roots - self._pickable_roots
+        if not removed and not added:
+            return
+        count = len(removed) + len(added)
+
+        # Removals go first since adding a root overrides its whole subtree.
+        for index, prim_path in enumerate(removed):
+            # A root below a new root is only dropped once that root applied.
+            if not _has_ancestor(prim_path, roots):
+                context.set_pickable(prim_path, False)
+                self._pickable_roots.discard(prim_path)
+            yield (index + 1) / count
+        for index, prim_path in enumerate(added, len(removed)):
+            context.set_pickable(prim_path, True)
+            self._pickable_roots.add(prim_path)
+            yield (index + 1) / count
+        self._pickable_roots = roots
+
+        carb.log_info(
+            f"Pick-able roots: {len(added)} added, {len(removed)} removed, {len(roots)} total "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
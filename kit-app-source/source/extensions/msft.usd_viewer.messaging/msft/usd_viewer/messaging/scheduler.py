@@ -0,0 +1,188 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import time
+import typing
+
+import carb
+import carb.settings
+import omni.kit.app
+
+BUDGET_SETTING = "/exts/msft.usd_viewer.messaging/scheduler_budget_ms"
+DEFAULT_BUDGET_MS = 4.0
+
+# Tasks of higher priority run first in every frame.
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+# A resumable operation: a generator yielding its progress, from 0 to 1, or
+# None when unknown, and returning its result.
+Work = typing.Generator[typing.Union[float, None], None, typing.Any]
+
+
+def run_to_completion(work: Work) -> typing.Any:
+    """Run `work` within the current frame and return its result."""
+    while True:
+        try:
+            next(work)
+        except StopIteration as e:
+            return e.value
+
+
+class ScheduledTask:
+    """A resumable operation run by the `FrameScheduler`, awaitable for its result."""
+    def __init__(self, work: Work, name: str, priority: int):
+        self.name: str = name
+        self.priority: int = priority
+        self.progress: typing.Union[float, None] = None
+        self.frames: int = 0
+        self.steps: int = 0
+        self.elapsed_ms: float = 0.0
+        self._work: Work = work
+        self._future: asyncio.Future = asyncio.get_event_loop().create_future()
+
+    def __await__(self):
+        return self._future.__await__()
+
+    @property
+    def done(self) -> bool:
+        """True once the task completed, failed or was cancelled."""
+        return self._future.done()
+
+    def cancel(self) -> None:
+        """Stop the task, its work is closed where it stopped."""
+        if self.done:
+            return
+        self._work.close()
+        self._future.cancel()
+
+    def _step(self) -> bool:
+        """Run one step of the work. Returns False once the task is done."""
+        self.steps += 1
+        try:
+            progress = next(self._work)
+        except StopIteration as e:
+            self.progress = 1.0
+            self._future.set_result(e.value)
+            return False
+        except Exception as e:
+            carb.log_error(f"Scheduled task '{self.name}' failed: {e}")
+            self._future.set_exception(e)
+            return False
+        if progress is not None:
+            self.progress = progress
+        return True
+
+
+class FrameScheduler:
+    """
+    Runs long stage operations as resumable generators spread over frames.
+
+    Every frame, tasks are stepped by priority, and in submission order
+    within a priority, until `budget_ms` is spent. At least one step runs
+    per frame so every task eventually completes.
+    """
+    def __init__(self, budget_ms: typing.Union[float, None] = None):
+        if budget_ms is None:
+            budget_ms = carb.settings.get_settings().get_as_float(BUDGET_SETTING) or DEFAULT_BUDGET_MS
+        self._budget_ms: float = budget_ms
+        self._tasks: typing.List[ScheduledTask] = []
+        self._runner: typing.Union[asyncio.Future, None] = None
+
+        # Counters
+        self._frames: int = 0
+        self._completed: int = 0
+        self._cancelled: int = 0
+
+    @property
+    def tasks(self) -> typing.List[ScheduledTask]:
+        """The pending tasks."""
+        return list(self._tasks)
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """Task counters, `frames` counts the frames that ran any task."""
+        return {
+            "frames": self._frames,
+            "completed": self._completed,
+            "cancelled": self._cancelled,
+            "pending": len(self._tasks),
+        }
+
+    def submit(self, work: Work, name: str = "", priority: int = PRIORITY_NORMAL) -> ScheduledTask:
+        """Schedule `work`, starting on the next frame slice."""
+        task = ScheduledTask(work, name, priority)
+        self._tasks.append(task)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.ensure_future(self._run())
+        return task
+
+    def cancel(self, name: str) -> None:
+        """Cancel the pending tasks named `name`."""
+        for task in [o for o in self._tasks if o.name == name]:
+            task.cancel()
+            self._tasks.remove(task)
+            self._cancelled += 1
+
+    def _run_slice(self) -> None:
+        start = time.perf_counter()
+        deadline = start + self._budget_ms / 1000
+        self._frames += 1
+        # The sort is stable, tasks of equal priority keep their order.
+        for task in sorted(self._tasks, key=lambda o: -o.priority):
+            if task.done:
+                continue
+            task.frames += 1
+            task_start = time.perf_counter()
+            is_running = True
+            while is_running:
+                is_running = task._step()
+                if time.perf_counter() >= deadline:
+                    break
+            task.elapsed_ms += (time.perf_counter() - task_start) * 1000
+            if not is_running:
+                self._tasks.remove(task)
+                self._completed += 1
+                carb.log_info(
+                    f"Scheduled task '{task.name}' completed in {task.frames} frames, "
+                    f"{task.steps} steps, {task.elapsed_ms:.1f} ms"
+                )
+            if time.perf_counter() >= deadline:
+                break
+
+    async def _run(self) -> None:
+        while self._tasks:
+            self._run_slice()
+            if self._tasks:
+                await omni.kit.app.get_app().next_update_async()
+
+    def on_shutdown(self) -> None:
+        """Cancel every pending task."""
+        for task in self._tasks:
+            task.cancel()
+        self._cancelled += len(self._tasks)
+        self._tasks.clear()
+        if self._runner:
+            self._runner.cancel()
+            self._runner = None
@@ -0,0 +1,140 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import collections
+import os
+import typing
+
+from pxr import Usd
+
+import carb
+import carb.settings
+import omni.client
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CAPACITY_SETTING = "/exts/msft.usd_viewer.messaging/stage_cache/capacity"
+MAX_MEMORY_SETTING = "/exts/msft.usd_viewer.messaging/stage_cache/max_memory_mb"
+
+
+def get_resident_memory_mb() -> typing.Union[float, None]:
+    """Return the resident memory of the process in MB, None where it can't be read."""
+    if psutil:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class WarmStageCache:
+    """
+    Keeps the recently closed stages composed so they can be attached again
+    instead of being re-opened.
+
+    Stages are held in a `Usd.StageCache` and evicted least recently used
+    first, beyond `capacity` stages or while the process uses more than
+    `max_memory_mb`. Resident memory is rarely given back right away, so a
+    single older stage is evicted for memory per added stage. A capacity of 0
+    disables the cache.
+    """
+    def __init__(self, capacity: typing.Union[int, None] = None, max_memory_mb: typing.Union[int, None] = None):
+        settings = carb.settings.get_settings()
+        self._capacity: int = settings.get_as_int(CAPACITY_SETTING) if capacity is None else capacity
+        self._max_memory_mb: int = settings.get_as_int(MAX_MEMORY_SETTING) if max_memory_mb is None else max_memory_mb
+        self._cache = Usd.StageCache()
+        # Cache id of every stage by normalized URL, least recently used first.
+        self._ids: collections.OrderedDict = collections.OrderedDict()
+
+        # Counters
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """Hit, miss and eviction counters."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "size": len(self._ids),
+        }
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return omni.client.normalize_url(url)
+
+    def add(self, url: str, stage: Usd.Stage) -> None:
+        """Keep `stage`, opened from `url`, as the most recently used."""
+        if self._capacity <= 0 or not url or not stage:
+            return
+        key = self._key(url)
+        stage_id = self._ids.pop(key, None)
+        if stage_id is not None and self._cache.Find(stage_id) != stage:
+            self._cache.Erase(stage_id)
+            stage_id = None
+        if stage_id is None:
+            stage_id = self._cache.Insert(stage)
+        self._ids[key] = stage_id
+        carb.log_info(f"Keeping stage '{url}' warm, {len(self._ids)} cached.")
+        self._evict()
+
+    def pop(self, url: str) -> typing.Union[Usd.Stage, None]:
+        """Take the cached stage opened from `url` out of the cache, None on a miss."""
+        stage_id = self._ids.pop(self._key(url), None) if url else None
+        stage = self._cache.Find(stage_id) if stage_id is not None else None
+        if stage_id is not None:
+            self._cache.Erase(stage_id)
+        if not stage:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return stage
+
+    def _evict(self) -> None:
+        while len(self._ids) > self._capacity:
+            self._evict_oldest("capacity")
+        if self._max_memory_mb <= 0:
+            return
+        # The allocator rarely returns freed memory to the system, the resident
+        # size wouldn't drop until the cache is empty. Evict one stage per add,
+        # never the stage just added.
+        memory_mb = get_resident_memory_mb()
+        if len(self._ids) > 1 and memory_mb is not None and memory_mb > self._max_memory_mb:
+            self._evict_oldest(f"memory {memory_mb:.0f} MB")
+
+    def _evict_oldest(self, reason: str) -> None:
+        key, stage_id = self._ids.popitem(last=False)
+        self._cache.Erase(stage_id)
+        self._evictions += 1
+        carb.log_info(f"Evicted warm stage '{key}' ({reason}).")
+
+    def clear(self) -> None:
+        """Drop every cached stage."""
+        self._ids.clear()
+        self._cache.Clear()
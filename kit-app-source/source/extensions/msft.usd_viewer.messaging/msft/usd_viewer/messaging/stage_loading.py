@@ -20,6 +20,10 @@
 # DEALINGS IN THE SOFTWARE.
 
 import asyncio
+import time
+import typing
+
+from pxr import Usd
 
 import carb
 import carb.events
@@ -30,12 +34,47 @@ import omni.kit.app
 import omni.kit.livestream.messaging as messaging
 import omni.usd
 import omni.client
+import carb.settings
+
+from .load_policy import LoadPolicy
+from .load_metrics import LoadMetricsWriter, compute_durations, compute_stage_counts
+from .load_state import LoadError, LoadPhase, LoadStateMachine
+from .outbox import MessageOutbox, ThrottledSender
+from .stage_cache import WarmStageCache
+from .stage_prefetch import ENABLED_SETTING as PREFETCH_ENABLED_SETTING, LayerPrefetcher
+
+PROGRESS_ENABLED_SETTING = "/exts/msft.usd_viewer.messaging/progress/enabled"
+PROGRESS_MAX_RATE_SETTING = "/exts/msft.usd_viewer.messaging/progress/max_rate_hz"
+
+
+class LoadRequest:
+    """An `openStageRequest` and the requests merged into it."""
+    def __init__(self, request_id: str, requested_url: str, url: str, load_policy: LoadPolicy):
+        self.request_id: str = request_id
+        self.request_ids: typing.List[str] = [request_id]
+        # URL as requested, without credentials, and the URL to open.
+        self.requested_url: str = requested_url
+        self.url: str = url
+        self.load_policy: LoadPolicy = load_policy
+        self.task: typing.Union[asyncio.Future, None] = None
+        # Set once the stage is opening, the request can't be cancelled anymore.
+        self.is_opening: bool = False
 
 
 class LoadingManager:
     """Manages the loading of USD stages and sends messages to the client"""
-    def __init__(self):
+    def __init__(self, outbox: MessageOutbox):
         self._subscriptions = []  # Holds subscription pointers
+        self._outbox: MessageOutbox = outbox
+        self._prefetcher: LayerPrefetcher = LayerPrefetcher()
+        self._stage_cache: WarmStageCache = WarmStageCache()
+        # Whether the stage being opened was attached from the warm stage cache.
+        self._stage_cache_hit: bool = False
+
+        # Loading progress and activity are forwarded at most at `max_rate_hz`.
+        max_rate_hz = carb.settings.get_settings().get_as_float(PROGRESS_MAX_RATE_SETTING)
+        self._progress_sender = ThrottledSender(outbox, "updateProgressAmount", max_rate_hz)
+        self._activity_sender = ThrottledSender(outbox, "updateProgressActivity", max_rate_hz)
 
         # -- state variables
         # URL of stage load request. Be careful sending urls to client because it may reveal directory paths
@@ -54,7 +93,22 @@ class LoadingManager:
         # States if opened stage is opened from storage as in not a
         # new unsaved stage
         self._persisted_stage: bool = False
-        self._is_evaluating_loading_status: bool = False
+
+        # Load completion, driven by the stage and streaming status events.
+        self._load_state: LoadStateMachine = LoadStateMachine()
+        self._load_monitor: typing.Union[asyncio.Future, None] = None
+        # `time.perf_counter` of the client request of the load, 0 for other loads.
+        self._load_requested_time: float = 0
+        self._prefetch_ms: float = 0
+        self._metrics_writer: LoadMetricsWriter = LoadMetricsWriter()
+
+        # How much of the current stage was loaded, None for stages not opened by a request.
+        self._load_policy: typing.Union[LoadPolicy, None] = LoadPolicy()
+
+        # Load queue: the request being loaded and the newest one waiting for it.
+        self._active_request: typing.Union[LoadRequest, None] = None
+        self._pending_request: typing.Union[LoadRequest, None] = None
+        self._request_count: int = 0
 
         # -- register outgoing events/messages
         outgoing = [
@@ -71,11 +125,12 @@ class LoadingManager:
         incoming = {
             'openStageRequest': self._on_open_stage,  # request to open a stage
             "loadingStateQuery": self._on_load_state_query,
+        }
+        if carb.settings.get_settings().get_as_bool(PROGRESS_ENABLED_SETTING):
             # internal event to capture progress status
-            # "omni.kit.window.status_bar@progress": self._on_progress, # Optional capture of asset loading progress
+            incoming["omni.kit.window.status_bar@progress"] = self._on_progress
             # internal event to capture progress activity
-            # "omni.kit.window.status_bar@activity": self._on_activity, # Optional capture of asset loading activity
-        }
+            incoming["omni.kit.window.status_bar@activity"] = self._on_activity
 
         message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
         for event_type, handler in incoming.items():
@@ -104,24 +159,32 @@ class LoadingManager:
     def _on_load_state_query(self, event: carb.events.IEvent) -> None:
         if event.type == carb.events.type_from_string("loadingStateQuery"):
             self._send_messages = True
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("loadingStateResponse")
             stage_url = self._requested_stage_url if self._requested_stage_url else self._opened_stage_url
             payload = {"loading_state": "idle", "url": stage_url}
-            if self._stage_is_opening:
+            if self._stage_is_opening or self._active_request:
                 payload = { "loading_state": "busy", "url": stage_url }
             elif self._stage_has_opened:
                 payload = { "loading_state": "idle", "url": stage_url }
 
-            message_bus.dispatch(event_type, payload=payload)
+            self._outbox.send("loadingStateResponse", payload)
 
 
     def _on_open_stage(self, event: carb.events.IEvent) -> None:
         """
         Handler for `openStageRequest` event.
 
-        Starts loading a given URL, will send success if the layer is already
+        Queues loading a given URL, will send success if the layer is already
         loaded, and an error on any failure.
+
+        A request for the URL already being loaded or queued is merged into
+        that request. A newer request cancels a request still queued or
+        prefetching, which is reported with a `cancelled` result. The
+        `request_id` of the payload, or a generated one, is echoed in the
+        result along with the `request_ids` of the merged requests.
+
+        An optional `load` policy limits what is loaded: `mode` is `all` or
+        `none`, `prim_paths` and `asset_ids` select the subtrees loaded in
+        `none` mode, and `population_mask` lists the only prims composed.
         """
         if event.type == carb.events.type_from_string("openStageRequest"):
             self._send_messages = True
@@ -131,12 +194,14 @@ class LoadingManager:
                 return
 
             client_url: omni.client.Url = omni.client.break_url_reference(event.payload["url"])
-            self._requested_stage_url = event.payload["url"]
+            requested_url = event.payload["url"]
+            self._request_count += 1
+            request_id = str(event.payload.get_dict().get("request_id") or self._request_count)
 
-            carb.log_info(f"Received message to load '{self._requested_stage_url}'")
+            carb.log_info(f"Received message to load '{requested_url}' ({request_id})")
 
             if client_url.query and 'sasToken=' in client_url.query:
-                self._requested_stage_url = self._requested_stage_url.replace(f"?{client_url.query}", '')
+                requested_url = requested_url.replace(f"?{client_url.query}", '')
                 host_name = client_url.query[client_url.query.find("&hostName="): client_url.query.find("&containerName=")].replace("&hostName=", "")
                 container_name = client_url.query[client_url.query.find("&containerName="):].replace("&containerName=","")
                 sas_token = client_url.query[: client_url.query.find("&hostName=")].replace("sasToken=", "")
@@ -160,46 +225,185 @@ class LoadingManager:
                     )
                 return url
 
-            # Check to see if we've already loaded the current stage.
-            url = process_url(self._requested_stage_url)
+            try:
+                load_policy = LoadPolicy.from_dict(event.payload.get_dict().get("load"))
+            except (ValueError, TypeError, AttributeError) as e:
+                carb.log_error(f"Invalid load policy in request {request_id}: {e}")
+                payload = {"url": requested_url, "result": "error", "error": str(e), "request_id": request_id}
+                self._outbox.send("openedStageResult", payload)
+                return
+
+            request = LoadRequest(request_id, requested_url, process_url(requested_url), load_policy)
 
-            stage = omni.usd.get_context().get_stage()
-            current_stage = stage.GetRootLayer().identifier if stage else ''
+            # Identical requests are merged into the one being loaded or queued.
+            for o in (self._active_request, self._pending_request):
+                if o and omni.client.utils.equal_urls(o.url, request.url) and o.load_policy == request.load_policy:
+                    carb.log_info(f"Merging request {request_id} into request {o.request_id} for '{request.url}'.")
+                    o.request_ids.append(request_id)
+                    return
 
-            # If we are, we don't need to reload the file, instead we'll just send the success message.
-            if omni.client.utils.equal_urls(url, current_stage):
-                carb.log_info(f'Client requested to open a stage that is already open: {url}')
-                message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                event_type = carb.events.type_from_string("openedStageResult")
-                payload = {"url": self._requested_stage_url, "result": "success", "error": ''}
-                message_bus.dispatch(event_type, payload=payload)
+            if self._pending_request:
+                self._send_cancelled(self._pending_request, f"Superseded by request {request_id}")
+                self._pending_request = None
+            active = self._active_request
+            if active and not active.is_opening:
+                # The load hasn't started yet, only its prefetch is lost. The
+                # cancelled prefetch cancels its queued layers and appends no
+                # more, the layers it fetched are dropped.
+                active.task.cancel()
+                self._prefetcher.release()
+                self._send_cancelled(active, f"Superseded by request {request_id}")
+                self._active_request = None
                 self._reset_state()
+
+            if self._active_request:
+                # The stage is opening, the request waits until it is loaded.
+                carb.log_info(f"Queueing request {request_id} until request {active.request_id} has loaded.")
+                self._pending_request = request
                 return
+            self._start_request(request)
+
+    def _start_request(self, request: "LoadRequest") -> None:
+        """Start loading the stage of `request`."""
+        self._active_request = request
+        self._requested_stage_url = request.requested_url
+        self._load_requested_time = time.perf_counter()
+        self._prefetch_ms = 0
 
-            # Asynchronously load the incoming stage
-            async def open_stage():
-                carb.log_info(f'Opening stage per client request: {url}')
-                usd_context = omni.usd.get_context()
-                if url:
-                    result, error = await usd_context.open_stage_async(url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)
+        # Check to see if we've already loaded the current stage.
+        url = request.url
+        stage = omni.usd.get_context().get_stage()
+        current_stage = stage.GetRootLayer().identifier if stage else ''
+
+        # If we are, we don't need to reload the file, instead we'll just send the success message.
+        if omni.client.utils.equal_urls(url, current_stage) and request.load_policy == self._get_load_policy(stage):
+            carb.log_info(f'Client requested to open a stage that is already open: {url}')
+            # Layers prefetched by a cancelled request are of no use.
+            self._prefetcher.release()
+            payload = {"url": self._requested_stage_url, "result": "success", "error": ''}
+            self._send_result(request, payload)
+            self._finish_request()
+            return
+
+        request.task = asyncio.ensure_future(self._open_stage(request, stage, current_stage))
+
+    async def _open_stage(self, request: "LoadRequest", stage, current_stage: str) -> None:
+        """Asynchronously load the stage of `request`."""
+        url = request.url
+        load_policy = request.load_policy
+        cached_stage = self._stage_cache.pop(url) if load_policy.is_default else None
+        # Prefetching would fetch the payloads the load policy leaves unloaded.
+        if not cached_stage and url and load_policy.is_default and \
+                carb.settings.get_settings().get_as_bool(PREFETCH_ENABLED_SETTING):
+            # Fetch the layers concurrently so composing the stage doesn't fetch them one by one.
+            carb.log_info(f'Prefetching the layers of: {url}')
+            try:
+                prefetch_result = await self._prefetcher.prefetch(url, self._on_prefetch_progress)
+            except asyncio.CancelledError:
+                # Superseded, the layers were released on cancellation and
+                # nothing else changed yet.
+                return
+            self._prefetch_ms = prefetch_result["elapsed_ms"]
+
+        # The request can't be cancelled anymore, the current stage is replaced.
+        request.is_opening = True
+        # Keep the stage being closed composed in case the client switches back to it.
+        # Partially loaded stages aren't kept, their URL doesn't describe them.
+        current_policy = self._get_load_policy(stage)
+        if stage and current_stage and not stage.GetRootLayer().anonymous and \
+                current_policy is not None and current_policy.is_default:
+            self._stage_cache.add(current_stage, stage)
+        self._stage_cache_hit = bool(cached_stage)
+        self._load_policy = load_policy
+        usd_context = omni.usd.get_context()
+        if cached_stage:
+            carb.log_info(f'Attaching cached stage per client request: {url}')
+            result, error = await usd_context.attach_stage_async(cached_stage)
+        else:
+            carb.log_info(f'Opening stage per client request: {url} ({load_policy})')
+            try:
+                if url and load_policy.population_mask:
+                    # omni.usd can't open a masked stage, it's composed aside then attached.
+                    try:
+                        masked_stage = await asyncio.get_event_loop().run_in_executor(
+                            None, load_policy.open_masked, url
+                        )
+                    except Exception as e:
+                        result, error = False, str(e)
+                    else:
+                        result, error = await usd_context.attach_stage_async(masked_stage)
+                elif url:
+                    result, error = await usd_context.open_stage_async(url, load_policy.initial_load_set)
                 else:
                     result, error = await usd_context.new_stage_async()
+            finally:
+                # The opened stage now holds the layers it uses.
+                self._prefetcher.release()
 
-                message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                event_type = carb.events.type_from_string("openedStageResult")
+        if request is not self._active_request:
+            # The load was already reported and the queue moved on.
+            return
+        cache = "hit" if self._stage_cache_hit else "miss"
+        if result is not True:
+            # Send message to client that loading failed.
+            carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
+            self._load_state.fail(error)
+            payload = {
+                "url": url, "result": "error", "error": error, "cache": cache, **self._get_load_metrics(loaded=False)
+            }
+            self._metrics_writer.write(payload)
+            self._send_result(request, payload)
+            self._reset_state()
+            self._finish_request()
+            return
 
-                if result is not True:
-                    # Send message to client that loading failed.
-                    carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
-                    payload = {"url": url, "result": "error", "error": error}
-                    message_bus.dispatch(event_type, payload=payload)
-                    self._reset_state()
-                    return
+        if not load_policy.is_default:
+            load_policy.apply(usd_context.get_stage())
 
-                payload = {"url": url, "result": "success", "error": ''}
-                message_bus.dispatch(event_type, payload=payload)
+        # Stages loaded from storage are reported once their assets loaded.
+        if not self._load_monitor:
+            payload = {"url": url, "result": "success", "error": '', "cache": cache}
+            self._send_result(request, payload)
+            self._finish_request()
 
-            asyncio.ensure_future(open_stage())
+    def _get_load_policy(self, stage) -> typing.Union[LoadPolicy, None]:
+        """
+        Return the load policy `stage` was opened with, None if unknown.
+        Stages not opened by a request, e.g. on startup, are taken as fully
+        loaded unless they are masked or some of their payloads are unloaded.
+        """
+        if self._load_policy is not None or not stage:
+            return self._load_policy
+        if stage.GetPopulationMask() != Usd.StagePopulationMask.All():
+            return None
+        if len(stage.GetLoadSet()) != len(stage.FindLoadable()):
+            return None
+        return LoadPolicy()
+
+    def _send_result(self, request: typing.Union["LoadRequest", None], payload: dict) -> None:
+        """Send `openedStageResult`, echoing the ids of `request` if the load was requested."""
+        if request:
+            payload["request_id"] = request.request_id
+            payload["request_ids"] = list(request.request_ids)
+        self._outbox.send("openedStageResult", payload)
+
+    def _send_cancelled(self, request: "LoadRequest", reason: str) -> None:
+        carb.log_info(f"Cancelling request {request.request_id} for '{request.url}': {reason}")
+        payload = {"url": request.requested_url, "result": "cancelled", "error": reason}
+        self._send_result(request, payload)
+
+    def _finish_request(self) -> None:
+        """Complete the active request and start the queued one, if any."""
+        self._active_request = None
+        request = self._pending_request
+        self._pending_request = None
+        if request:
+            self._start_request(request)
+
+    def _on_prefetch_progress(self, processed: int, discovered: int) -> None:
+        """Forward the layer prefetch progress to the streaming client."""
+        self._progress_sender.send({"progress": processed / discovered}, force=processed == discovered)
+        self._activity_sender.send({"text": f"Fetching layers ({processed}/{discovered})"})
 
     def _on_stage_event(self, event: carb.events.IEvent) -> None:
         """Manage extension state via the stage event stream.
@@ -217,17 +421,38 @@ class LoadingManager:
             else:
                 self._opened_stage_url = ''
             self._persisted_stage = True if self._opened_stage_url else False
+
+            # A new load supersedes the one being monitored.
+            if self._load_monitor:
+                self._load_monitor.cancel()
+                self._load_monitor = None
+            self._load_state.begin()
+            # Loads not started by a request, e.g. on startup, are reported
+            # without request ids, their load policy is found from the stage.
+            request = self._active_request
+            if request and not request.is_opening:
+                request = None
+            if not request:
+                self._load_policy = None
+            # Only evaluate for stage loaded from storage.
+            if self._persisted_stage:
+                self._load_monitor = asyncio.ensure_future(self._evaluate_load_status(request))
+            return
+
+        if event.type == int(omni.usd.StageEventType.OPENED):
+            self._load_state.advance(LoadPhase.OPENED)
             return
 
         if event.type == int(omni.usd.StageEventType.ASSETS_LOADED):
             # Check that a stage is opening. Assets can load after stage has opened.
             if not self._stage_is_opening:
                 return
+            # The last progress and activity of the load are never held back.
+            self._progress_sender.flush()
+            self._activity_sender.flush()
             self._stage_is_opening = False
             self._stage_has_opened = True
-
-            # Async call to evaluate opened state
-            asyncio.ensure_future(self._evaluate_load_status())
+            self._load_state.advance(LoadPhase.ASSETS_LOADED)
             return
 
     def _on_rxt_streaming_event(self, event: carb.events.IEvent) -> None:
@@ -239,47 +464,91 @@ class LoadingManager:
             https://docs.omniverse.nvidia.com/kit/docs/kit-manual/105.0/carb.events/carb.events.IEvent.html
         """
         self._streaming_manager_is_busy = event.payload['isBusy']
+        self._load_state.set_streaming_busy(self._streaming_manager_is_busy)
 
-    async def _evaluate_load_status(self):
+    async def _evaluate_load_status(self, request: typing.Union[LoadRequest, None]):
         """
-        If streaming manager is not busy and the stage is loaded from storage,
-        notify the client.
+        Wait for the stage to be opened, its assets loaded and the streaming
+        manager idle, then notify the client. Every phase must be reached
+        within its `load_timeout`, an error is sent otherwise.
         """
-        # Only evaluate for stage loaded from storage.
-        if not self._persisted_stage:
+        url = self._requested_stage_url if self._requested_stage_url else '[obfuscated]'
+        try:
+            for phase in (LoadPhase.OPENED, LoadPhase.ASSETS_LOADED, LoadPhase.STREAMING_IDLE):
+                await self._load_state.wait_for(phase, self._load_state.get_timeout(phase))
+        except asyncio.CancelledError:
+            # Superseded by a new load.
             return
-
-        if self._is_evaluating_loading_status:
+        except LoadError as e:
+            if self._load_state.phase == LoadPhase.IDLE:
+                # The load failed and the failure was already reported.
+                return
+            carb.log_error(f'Stage failed to load: {url} ({e})')
+            payload = {"url": url, "result": "error", "error": str(e), **self._get_load_metrics(loaded=False)}
+            self._load_state.reset()
+            self._metrics_writer.write(payload)
+            if self._send_messages:
+                self._send_result(request, payload)
+            self._load_monitor = None
+            self._stage_is_opening = False
+            self._reset_state()
+            if request and request is self._active_request:
+                self._finish_request()
             return
-        self._is_evaluating_loading_status = True
-
-        # Wait until all dependencies have loaded by streaming manager
-        while self._streaming_manager_is_busy or not self._stage_has_opened:
-            await omni.kit.app.get_app().next_update_async()
 
+        # Let the first frame of the loaded stage render.
         for _ in range(2):
             await omni.kit.app.get_app().next_update_async()
-
-        if not self._send_messages:
-            return
-        # Stage has loaded with all dependencies. Send message to client.
-        message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-        event_type = carb.events.type_from_string("openedStageResult")
-        url = self._requested_stage_url if self._requested_stage_url  else '[obfuscated]'
-        carb.log_info(
-            f'Sending message to client that stage has loaded: {url}'
-        )
-        payload = {"url": url, "result": "success", "error": ''}
-        message_bus.dispatch(event_type, payload=payload)
+        self._load_monitor = None
+
+        # Stage has loaded with all dependencies.
+        payload = {
+            "url": url,
+            "result": "success",
+            "error": '',
+            "cache": "hit" if self._stage_cache_hit else "miss",
+            **self._get_load_metrics(),
+        }
+        carb.log_info(f"Stage load metrics: {payload['durations_ms']}")
+        self._metrics_writer.write(payload)
+        if self._send_messages:
+            # Send message to client.
+            carb.log_info(
+                f'Sending message to client that stage has loaded: {url}'
+            )
+            self._send_result(request, payload)
 
         # reset
-        self._is_evaluating_loading_status = False
         self._reset_state()
+        if request and request is self._active_request:
+            self._finish_request()
+
+    def _get_load_metrics(self, loaded: bool = True) -> dict:
+        """
+        Return the durations between the events of the current load and, if
+        the stage `loaded`, its size. The stage of a failed load isn't the
+        requested one, so it isn't counted.
+        """
+        # Counting traverses the stage, it's done before the time of sending
+        # is taken so that the reported durations include it.
+        counts = compute_stage_counts(omni.usd.get_context().get_stage()) if loaded else {}
+        timestamps = self._load_state.phase_timestamps
+        timestamps.pop("idle", None)
+        if self._load_requested_time:
+            timestamps["requested"] = self._load_requested_time
+        timestamps["sent"] = time.perf_counter()
+        return {
+            "durations_ms": compute_durations(timestamps),
+            "prefetch_ms": round(self._prefetch_ms, 3),
+            **counts,
+        }
 
     def _on_progress(self, event: carb.events.IEvent):
         """
         Handler for `omni.kit.window.status_bar@progress` event.
-        This forwards the statusbar progress events to the streaming client.
+        This forwards the statusbar progress events to the streaming client,
+        at most `progress.max_rate_hz` times per second. Completion is always
+        sent right away.
         """
         # Only notify for stage loaded from storage.
         if not self._persisted_stage:
@@ -290,18 +559,19 @@ class LoadingManager:
             # print(f'Loading progress: {event.payload.get_dict()}')
             if not self._send_messages:
                 return
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            # Send progress message
-            carb.log_info('Sending message to client about loading progress.')
-            event_type = carb.events.type_from_string("updateProgressAmount")
             # event.payload.get_dict() is used to capture a copy of the
             # incoming event's payload as a python dictionary
-            message_bus.dispatch(event_type, payload=event.payload.get_dict())
+            payload = event.payload.get_dict()
+            is_complete = payload.get("progress", 0) >= 1
+            self._progress_sender.send(payload, force=is_complete)
+            if is_complete:
+                self._activity_sender.flush()
 
     def _on_activity(self, event: carb.events.IEvent):
         """
         Handler for `omni.kit.window.status_bar@activity` event.
-        This forwards the statusbar activity events to the streaming client.
+        This forwards the statusbar activity events to the streaming client,
+        at most `progress.max_rate_hz` times per second.
         """
         # Only notify for stage loaded from storage.
         if not self._persisted_stage:
@@ -312,12 +582,7 @@ class LoadingManager:
             # print(f'Loading activity: {event.payload.get_dict()}')
             if not self._send_messages:
                 return
-            carb.log_info('Storing message about loading activity.')
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            # Send activity message
-            carb.log_info('Sending message to client about loading activity.')
-            event_type = carb.events.type_from_string("updateProgressActivity")
-            message_bus.dispatch(event_type, payload=event.payload.get_dict())
+            self._activity_sender.send(event.payload.get_dict())
 
     def on_shutdown(self) -> None:
         """
@@ -325,6 +590,20 @@ class LoadingManager:
         """
         if self._subscriptions:
             self._subscriptions.clear()
+        if self._load_monitor:
+            self._load_monitor.cancel()
+            self._load_monitor = None
+        self._load_state.reset()
+        if self._active_request and self._active_request.task:
+            self._active_request.task.cancel()
+        self._active_request = None
+        self._pending_request = None
+        self._prefetcher.on_shutdown()
+        carb.log_info(f"Warm stage cache counters: {self._stage_cache.stats}")
+        self._stage_cache.clear()
+        carb.log_info(f"Progress counters: {self._progress_sender.stats}, activity: {self._activity_sender.stats}")
+        self._progress_sender.on_shutdown()
+        self._activity_sender.on_shutdown()
 
     def _reset_state(self):
         """
@@ -336,3 +615,6 @@ class LoadingManager:
         self._stage_has_opened = False
         self._streaming_manager_is_busy = False
         self._persisted_stage = False
+        self._stage_cache_hit = False
+        self._load_requested_time = 0
+        self._prefetch_ms = 0
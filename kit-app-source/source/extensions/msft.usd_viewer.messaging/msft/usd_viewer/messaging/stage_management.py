@@ -20,9 +20,10 @@
 # DEALINGS IN THE SOFTWARE.
 
 import asyncio
+import collections
 import typing
 
-from pxr import UsdGeom, Usd
+from pxr import Sdf, Tf, UsdGeom, Usd
 
 import carb
 import carb.dictionary
@@ -36,21 +37,65 @@ import omni.kit.app
 import omni.kit.livestream.messaging as messaging
 from omni.kit.viewport.utility import get_active_viewport_camera_string
 
+from .asset_index import AssetIndex
+from .hierarchy import HierarchyWalker, has_children
+from .outbox import MessageOutbox
+from .payload_loading import PayloadManager
+from .pickability import PickabilityManager
+from .scheduler import PRIORITY_HIGH, PRIORITY_LOW, FrameScheduler, Work, run_to_completion
+
 DATA_ATTRIBUTE_NAME = "asset_id"
+CHILDREN_CACHE_SIZE_SETTING = "/exts/msft.usd_viewer.messaging/children_cache_size"
+
+
+def _is_related(path_a: str, path_b: str) -> bool:
+    """Return True if one of the paths is the other or one of its ancestors."""
+    if len(path_a) > len(path_b):
+        path_a, path_b = path_b, path_a
+    return path_a == path_b or path_a == "/" or path_b.startswith(path_a + "/")
 
 class StageManager:
     """This class manages the stage and its related events."""
-    def __init__(self):
+    def __init__(
+        self, asset_index: AssetIndex, outbox: MessageOutbox, scheduler: FrameScheduler, payloads: PayloadManager
+    ):
+        self._asset_index: AssetIndex = asset_index
+        self._outbox: MessageOutbox = outbox
+        self._scheduler: FrameScheduler = scheduler
+        self._payloads: PayloadManager = payloads
+
         # Feature: Maintain selection of a dummy Prim in stage selection at all times
         # to enable selection groups to be rendered.
         self._dummy_prim_feature_on: bool = True
         self._dummy_prim_path: str = ''
-        self._is_selecting_dummy_prim: bool = False
+
+        # Selection state: the last selection applied by this manager, used
+        # to recognize the selection events it caused itself.
+        self._applied_selection: typing.FrozenSet[str] = frozenset()
+        self._is_selection_pending: bool = False
+
+        # Selection notifications: the asset ids the client is known to have
+        # selected and the revision of the last notification. In delta mode
+        # only the added and removed asset ids are sent.
+        self._notified_asset_ids: typing.List[str] = []
+        self._selection_revision: int = 0
+        self._is_selection_delta_mode: bool = False
 
         # Internal messaging state
-        self._is_external_update: bool = False
         self._camera_attrs = {}
         self._subscriptions = []
+        self._pickability: PickabilityManager = PickabilityManager()
+
+        # LRU cache of `getChildrenRequest` results, invalidated by USD change
+        # notices for the subtrees they cover.
+        self._children_cache: collections.OrderedDict = collections.OrderedDict()
+        self._children_cache_size: int = carb.settings.get_settings().get_as_int(CHILDREN_CACHE_SIZE_SETTING)
+        self._children_cache_hits: int = 0
+        self._children_cache_misses: int = 0
+        # Paths resynced while children are being enumerated by scheduled tasks.
+        self._children_tasks: int = 0
+        self._resynced_paths: typing.Set[str] = set()
+        self._stage_listener = None
 
         # -- register outgoing events/messages
         outgoing = [
@@ -62,6 +107,10 @@ class StageManager:
             "makePrimsPickableResponse",
             # response to the request to reset camera attributes
             "resetStageResponse",
+            # response to the request to load the payloads of assets
+            "loadAssetsResponse",
+            # response to the request to unload the payloads of assets
+            "unloadAssetsResponse",
         ]
 
         for o in outgoing:
@@ -73,10 +122,16 @@ class StageManager:
             'getChildrenRequest': self._on_get_children,
             # request to select a prim
             'selectPrimsRequest': self._on_select_prims,
+            # request to negotiate the selection notification mode
+            'stageSelectionSyncRequest': self._on_selection_sync,
             # request to make primitives pick-able
             'makePrimsPickable': self._on_make_pickable,
             # request to make primitives pick-able
             'resetStage': self._on_reset_camera,
+            # request to load the payloads of assets
+            'loadAssetsRequest': self._on_load_assets,
+            # request to unload the payloads of assets
+            'unloadAssetsRequest': self._on_unload_assets,
         }
 
         for event_type, handler in incoming.items():
@@ -101,64 +156,194 @@ class StageManager:
         if not prim:
             return []
 
-        filter_types = {
-            "USDGeom": UsdGeom.Mesh,
-            "mesh": UsdGeom.Mesh,
-            "xform": UsdGeom.Xform,
-            "scope": UsdGeom.Scope,
-        }
+        return HierarchyWalker(filters, recursiveDepth).walk_tree(prim)
+
+
+    def get_children_page(
+        self, prim_path, filters=None, recursiveDepth=0, limit: int = 0, cursor: str = ""
+    ) -> typing.Tuple[typing.List[dict], str]:
+        """
+        Collect at most `limit` children of the given `prim_path`, starting
+        after the child `cursor` refers to.
+
+        Children are returned in stage order, which is stable while the
+        stage is not edited. Returns the children and the cursor of the next
+        page, an empty string when there are no more children. A cursor holds
+        the position and name of the last child returned, the name finds the
+        child again when children were added or removed before it.
+        """
+        return run_to_completion(self.iter_children_page(prim_path, filters, recursiveDepth, limit, cursor))
+
 
+    def iter_children_page(
+        self, prim_path, filters=None, recursiveDepth=0, limit: int = 0, cursor: str = ""
+    ) -> Work:
+        """Resumable `get_children_page`, yielding while the descendants are enumerated."""
+        stage = omni.usd.get_context().get_stage()
+        prim = stage.GetPrimAtPath(prim_path)
+        if not prim:
+            return [], ""
+
+        # Only the names are listed up front so that a page only creates the
+        # prims it returns.
+        names = prim.GetChildrenNames()
+        start = 0
+        if cursor:
+            start = self._find_cursor(names, cursor)
+            if start < 0:
+                raise ValueError(f"Invalid cursor '{cursor}' for '{prim_path}'")
+            start += 1
+
+        walker = HierarchyWalker(filters, recursiveDepth - 1)
+        is_root = prim.IsPseudoRoot()
         children = []
-        for child in prim.GetChildren():
-            # If a child doesn't pass any filter, we skip it.
-            if filters is not None:
-                if not any(child.IsA(filter_types[filt]) for filt in filters if filt in filter_types):
-                    continue
-
-            child_name = child.GetName()
-            child_path = str(prim.GetPath())
-            # Skipping over cameras
-            if child_name.startswith('OmniverseKit_'):
+        for index in range(start, len(names)):
+            child = prim.GetChild(names[index])
+            if not walker.accepts(child, is_root):
                 continue
-            # Also skipping rendering primitives.
-            if prim_path == '/' and child_name == 'Render':
-                continue
-            child_path = child_path if child_path != '/' else ''
-            info = {"name": child_name, "path": f'{child_path}/{child_name}'}
-
+            info = {"name": child.GetName(), "path": child.GetPath().pathString}
             # We return an empty list here to indicate that children are
-            # available, but the current app does not support pagination,
-            # so we use this to lazy load the stage tree.
-            if child.GetChildren():
-                if recursiveDepth > 0:
-                    info["children"] = self.get_children(prim_path=info['path'], filters=filters, recursiveDepth=recursiveDepth-1)
-                else:
-                    info["children"] = []
-
+            # available, so we use this to lazy load the stage tree.
+            if has_children(child):
+                info["children"] = (yield from walker.iter_tree(child)) if recursiveDepth > 0 else []
             children.append(info)
+            if limit and len(children) >= limit:
+                return children, f"{index}:{names[index]}" if index + 1 < len(names) else ""
+            yield (index - start + 1) / (len(names) - start)
+
+        return children, ""
+
+
+    @staticmethod
+    def _find_cursor(names: typing.List[str], cursor: str) -> int:
+        """Return the index of the child `cursor` refers to, -1 if it doesn't exist anymore."""
+        index, _, name = cursor.partition(":")
+        try:
+            index = int(index)
+        except ValueError:
+            return -1
+        if 0 <= index < len(names) and names[index] == name:
+            return index
+        # The children changed since the cursor was returned.
+        try:
+            return names.index(name)
+        except ValueError:
+            return -1
+
+
+    def get_children_cached(
+        self, prim_path, filters=None, recursiveDepth=0, limit: int = 0, cursor: str = ""
+    ) -> typing.Tuple[typing.List[dict], str]:
+        """
+        Same as `get_children_page`, served from the children cache when
+        the same request was answered before.
+        """
+        return run_to_completion(self.iter_children_cached(prim_path, filters, recursiveDepth, limit, cursor))
+
+
+    def iter_children_cached(
+        self, prim_path, filters=None, recursiveDepth=0, limit: int = 0, cursor: str = ""
+    ) -> Work:
+        """Resumable `get_children_cached`, which doesn't yield on cache hits."""
+        # The same filters sent in another order share an entry.
+        key = (prim_path, tuple(sorted(set(filters))) if filters is not None else None, recursiveDepth, limit, cursor)
+        result = self._children_cache.get(key)
+        if result is not None:
+            self._children_cache_hits += 1
+            self._children_cache.move_to_end(key)
+            return result
+
+        self._children_cache_misses += 1
+        stage = omni.usd.get_context().get_stage()
+        result = yield from self.iter_children_page(prim_path, filters, recursiveDepth, limit, cursor)
+        # Results of a stage that closed or changed meanwhile are not cached.
+        if self._children_cache_size > 0 and stage == omni.usd.get_context().get_stage() and self._is_cacheable(key):
+            self._children_cache[key] = result
+            while len(self._children_cache) > self._children_cache_size:
+                self._children_cache.popitem(last=False)
+        return result
+
+
+    @property
+    def children_cache_stats(self) -> typing.Dict[str, int]:
+        """Hit and miss counters of the `getChildrenRequest` cache."""
+        return {
+            "hits": self._children_cache_hits,
+            "misses": self._children_cache_misses,
+            "size": len(self._children_cache),
+        }
 
-        return children
+
+    def _is_cacheable(self, key: tuple) -> bool:
+        """Return False if the subtree of `key` was resynced while it was enumerated."""
+        return not any(_is_related(key[0], o) for o in self._resynced_paths)
+
+
+    def _on_objects_changed(self, notice: Usd.Notice.ObjectsChanged, stage: Usd.Stage) -> None:
+        """Drop the cached children of every prim related to a resynced prim."""
+        resynced = [
+            o.pathString for o in Sdf.Path.RemoveDescendentPaths(notice.GetResyncedPaths()) if not o.IsPropertyPath()
+        ]
+        if not resynced:
+            return
+        # Remembered while children are enumerated over several frames.
+        if self._children_tasks:
+            self._resynced_paths.update(resynced)
+        if not self._children_cache:
+            return
+
+        stale = [key for key in self._children_cache if any(_is_related(key[0], o) for o in resynced)]
+        for key in stale:
+            del self._children_cache[key]
 
 
     def _on_get_children(self, event: carb.events.IEvent) -> None:
         """
         Handler for the `getChildrenRequest` event
         Collects a filtered collection of a given primitives children.
+
+        Large prims can be paged through by sending `limit` and the
+        `next_cursor` of the previous response as `cursor`.
         """
         if event.type == carb.events.type_from_string("getChildrenRequest"):
             carb.log_info("Received message to return list of a prim\'s children")
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("getChildrenResponse")
-            children = self.get_children(
-                prim_path=event.payload["prim_path"],
-                filters=event.payload["filters"]
+            request = event.payload.get_dict()
+            asyncio.ensure_future(self._get_children_async(request))
+
+
+    async def _get_children_async(self, request: dict) -> None:
+        """Enumerate the requested children over as many frames as needed and send `getChildrenResponse`."""
+        payload = {
+            "prim_path": request.get("prim_path", ""),
+            "children": [],
+            "next_cursor": "",
+        }
+        task = None
+        try:
+            work = self.iter_children_cached(
+                prim_path=payload["prim_path"],
+                filters=request.get("filters"),
+                recursiveDepth=int(request.get("depth") or 0),
+                limit=int(request.get("limit") or 0),
+                cursor=request.get("cursor") or ""
             )
-            payload = {
-                "prim_path": event.payload["prim_path"],
-                "children": children
-            }
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+            task = self._scheduler.submit(work, name="getChildren", priority=PRIORITY_HIGH)
+            self._children_tasks += 1
+            children, next_cursor = await task
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            carb.log_warn(f"Failed to get children: {e}")
+            payload["error"] = str(e)
+        else:
+            payload["children"] = children
+            payload["next_cursor"] = next_cursor
+        finally:
+            if task is not None:
+                self._children_tasks -= 1
+                if not self._children_tasks:
+                    self._resynced_paths.clear()
+        self._outbox.send("getChildrenResponse", payload)
 
 
     def _on_select_prims(self, event: carb.events.IEvent) -> None:
@@ -169,42 +354,78 @@ class StageManager:
         """
         if event.type == carb.events.type_from_string("selectPrimsRequest"):
             prims_to_select = []
+            selected_asset_ids = []
             if "paths" in event.payload:
                 new_selection = list(event.payload["paths"])
                 carb.log_info(f"Received message to select '{new_selection}'")
 
-                stage = omni.usd.get_context().get_stage()
-                for prim in stage.Traverse():
-                    # Check if the prim has the specified attribute
-                    if prim.HasAttribute(DATA_ATTRIBUTE_NAME):
-                        # Get the attribute object
-                        attribute = prim.GetAttribute(DATA_ATTRIBUTE_NAME)
+                # Each asset id is resolved once, duplicates are ignored.
+                for asset_id in dict.fromkeys(new_selection):
+                    prim_path = self._asset_index.get_prim_path(asset_id)
+                    if prim_path:
+                        prims_to_select.append(prim_path)
+                        selected_asset_ids.append(asset_id)
+
+            # Selected assets stream in on demand in auto mode.
+            if self._payloads.is_auto and prims_to_select:
+                self._payloads.load(prims_to_select, pinned=False)
+
+            # The client initiated the change and is already aware of it,
+            # so no stageSelectionChanged is sent. Only the asset ids that
+            # were selected are known to the next delta.
+            self._notified_asset_ids = selected_asset_ids
+            carb.log_info(f"Changing selection per client request {prims_to_select}.")
+            self._set_selection(prims_to_select)
 
-                        # Get the current value of the attribute
-                        attribute_value = attribute.Get()
 
-                        # Check if the value matches the desired value
-                        if attribute_value in new_selection:
-                            new_selection.remove(attribute_value)
-                            prims_to_select.append(prim.GetPath().pathString)
-                    if len(new_selection) == 0:
-                        break
+    def _on_selection_sync(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `stageSelectionSyncRequest` event.
 
-            if self._dummy_prim_feature_on:
-                if not self._dummy_prim_path:
-                    carb.log_info("Client requested to change the selection. Creating dummy prim")
-                    self._dummy_prim_path = self._create_dummy_prim()
-                if not self._dummy_prim_path in prims_to_select:
-                    carb.log_info("Client requested to change the selection. Adding dummy prim to selection.")
-                    prims_to_select.append(self._dummy_prim_path)
-
-            # Flagging this as an external event because it
-            # was initiated by the client.
-            self._is_external_update = True
-            carb.log_info(f"Changing selection per client request {prims_to_select}.")
-            sel = omni.usd.get_context().get_selection()
-            sel.clear_selected_prim_paths()
-            sel.set_selected_prim_paths(prims_to_select, True)
+        Sets the `mode` of `stageSelectionChanged` notifications, `full` or
+        `delta`. In delta mode, notifications carry the `added` and `removed`
+        asset ids along with their `revision` and `base_revision`. A full
+        snapshot is sent when the client `revision` doesn't match the
+        revision of the last notification.
+        """
+        if event.type == carb.events.type_from_string("stageSelectionSyncRequest"):
+            request = event.payload.get_dict()
+            self._is_selection_delta_mode = request.get("mode", "full") == "delta"
+            revision = request.get("revision", -1)
+            carb.log_info(
+                f"Client requested {'delta' if self._is_selection_delta_mode else 'full'} selection notifications "
+                f"at revision {revision}, current revision is {self._selection_revision}."
+            )
+            if revision != self._selection_revision:
+                payload = {"prims": self._notified_asset_ids, "revision": self._selection_revision, "snapshot": True}
+                self._outbox.send("stageSelectionChanged", payload, coalesce=False)
+
+
+    def _notify_selection(self, asset_ids: typing.List[str]) -> None:
+        """Notify the client that the selected asset ids changed."""
+        if not self._is_selection_delta_mode:
+            self._selection_revision += 1
+            self._notified_asset_ids = list(asset_ids)
+            payload = {"prims": self._notified_asset_ids, "revision": self._selection_revision}
+            self._outbox.send("stageSelectionChanged", payload)
+            return
+
+        previous = set(self._notified_asset_ids)
+        current = set(asset_ids)
+        added = [o for o in asset_ids if o not in previous]
+        removed = [o for o in self._notified_asset_ids if o not in current]
+        if not added and not removed:
+            return
+        self._selection_revision += 1
+        self._notified_asset_ids = list(asset_ids)
+        payload = {
+            "added": added,
+            "removed": removed,
+            "revision": self._selection_revision,
+            "base_revision": self._selection_revision - 1,
+        }
+        # Every delta is needed to rebuild the selection, none can be coalesced.
+        self._outbox.send("stageSelectionChanged", payload, coalesce=False)
 
 
     def _on_stage_event(self, event):
@@ -221,86 +442,16 @@ class StageManager:
             to allow for them to be reset.
         """
         if event.type == int(omni.usd.StageEventType.SELECTION_CHANGED):
-            # Skip event handling if the dummy is being selected.
-            if self._dummy_prim_feature_on and self._is_selecting_dummy_prim:
-                carb.log_info('omni.usd.StageEventType.SELECTION_CHANGED triggered but skipping evaluation because dummy is being selected.')
+            # Skip the events caused by the selection this manager applied.
+            selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+            if frozenset(selection) == self._applied_selection:
                 return
-            # If the selection changed came from an external event,
-            # we don't need to let the streaming client know because it
-            # initiated the change and is already aware.
-            if self._is_external_update:
-                carb.log_info('omni.usd.StageEventType.SELECTION_CHANGED triggered but skipping evaluation because the selection was triggered by client.')
-                self._is_external_update = False
-            else:
-                carb.log_info('omni.usd.StageEventType.SELECTION_CHANGED triggered. Evaluating what selection to notify client about')
-                message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                event_type = carb.events.type_from_string("stageSelectionChanged")
-
-                stage = omni.usd.get_context().get_stage()
-                context = omni.usd.get_context()
-                selection = context.get_selection().get_selected_prim_paths()
-
-                def getSelectablePath(path) -> typing.Union[str, None]:
-                    """
-                    Return a path of a prim that has a given attribute name. Could be a parent of the given path.
-                    """
-                    prim = stage.GetPrimAtPath(path)
-                    if prim.HasAttribute(DATA_ATTRIBUTE_NAME):
-                        return path
-                    path = path[:path.rfind('/')]
-                    if path:
-                        return getSelectablePath(path)
-                    return None
-
-                # Get prim paths for prims that has a given attribute name.
-                new_selection = []
-                for o in selection:
-                    path = getSelectablePath(o)
-                    if path is not None:
-                        new_selection.append(path)
-
-                # Remove duplicate paths.
-                new_selection = list(set(new_selection))
-
-                # Ensure dummy is selected and notify client of nothing being selected.
-                if self._dummy_prim_feature_on:
-                    if len(new_selection) == 0 and len(selection) == 0:
-                        carb.log_info('No selection found. Notifying client that nothing is selected.')
-                        payload = {"prims": []}
-                        message_bus.dispatch(event_type, payload=payload)
-                        message_bus.pump()
-                        carb.log_info('No selection found. Selecting dummy.')
-                        self._select_dummy_prim()
-                        return
-
-                # Change the selection and allow new selection event to re-trigger this handler.
-                if selection != new_selection:
-                    carb.log_info('Selecting filtered prim paths and allowing selection event to re-trigger selection handler.')
-                    sel = context.get_selection()
-                    sel.clear_selected_prim_paths()
-                    carb.log_info(f"Changing selection: {new_selection}.")
-                    sel.set_selected_prim_paths(new_selection, True)
-                    return
-
-                # Create a list of fabric ids since that is what the client manages selection by.
-                selected_asset_ids = []
-                for o in new_selection:
-                    prim = stage.GetPrimAtPath(o)
-                    attribute = prim.GetAttribute(DATA_ATTRIBUTE_NAME)
-                    selected_asset_ids.append(attribute.Get())
-
-                # Notify client about selection change
-                carb.log_info(f"Selection changed: Sending selected {DATA_ATTRIBUTE_NAME}s to client: {selected_asset_ids}")
-                payload = {"prims": selected_asset_ids}
-                message_bus.dispatch(event_type, payload=payload)
-                message_bus.pump()
-                carb.log_info(f"Selection changed: Path to USD prims currently selected = {omni.usd.get_context().get_selection().get_selected_prim_paths()}")
-
-                # Maintain a selection of dummy.
-                if self._dummy_prim_feature_on:
-                    self._select_dummy_prim()
-                    return
+            carb.log_info('omni.usd.StageEventType.SELECTION_CHANGED triggered. Evaluating selection on next frame.')
+            asyncio.ensure_future(self._resolve_selection())
+            return
 
+        if event.type == int(omni.usd.StageEventType.CLOSED):
+            self._reset_children_cache(None)
             return
 
         if event.type == int(omni.usd.StageEventType.OPENED):
@@ -308,12 +459,14 @@ class StageManager:
                 carb.log_info("A stage has opened. Resetting dummy prim path.")
                 self._dummy_prim_path = ''
             stage = omni.usd.get_context().get_stage()
+            self._reset_children_cache(stage)
             stage_url = stage.GetRootLayer().identifier if stage else ''
 
             if stage_url:
                 # Set the entire stage to not be pick-able.
                 context = omni.usd.get_context()
-                context.set_pickable("/", False)
+                self._scheduler.cancel("pickability")
+                self._pickability.reset()
                 # Clear before using, so that we're sure the data is only
                 # from the new stage.
                 self._camera_attrs.clear()
@@ -325,38 +478,17 @@ class StageManager:
             return
 
         if event.type == int(omni.usd.StageEventType.ASSETS_LOADED):
-            # Get children in stage
-            children = self.get_children(
-                prim_path="/World",
-                filters=["USDGeom", "scope", "xform"],
-                recursiveDepth=5
+            # Set prims with DATA_ATTRIBUTE_NAME attribute, and therefore
+            # their children, to be the only pick-able prims. Large stages
+            # have many roots, they are made pick-able over several frames.
+            self._scheduler.cancel("pickability")
+            self._pickability.reset()
+            self._scheduler.submit(
+                self._pickability.iter_set_pickable_paths(self._asset_index.get_prim_paths()),
+                name="pickability",
+                priority=PRIORITY_LOW,
             )
 
-            # Reset the stage to not be pick-able.
-            context = omni.usd.get_context()
-            context.set_pickable("/", False)
-
-            stage = omni.usd.get_context().get_stage()
-
-            def set_pickable(info, force_true=False):
-                # Set prims with DATA_ATTRIBUTE_NAME attribute to be pick-able.
-                # Also set children to be pick-able if its parent has DATA_ATTRIBUTE_NAME attribute
-                prim = stage.GetPrimAtPath(child['path'])
-                if prim.HasAttribute(DATA_ATTRIBUTE_NAME) or force_true:
-                    context.set_pickable(child['path'], True)
-                    if 'children' in info.keys():
-                        for o in info['children']:
-                            set_pickable(info=o, force_true=True)
-                else:
-                    if 'children' in info.keys():
-                        for o in info['children']:
-                            set_pickable(info=o, force_true=force_true)
-
-            # Set prims with DATA_ATTRIBUTE_NAME attribute to be pick-able.
-            stage = omni.usd.get_context().get_stage()
-            for child in children:
-                set_pickable(info=child)
-
             # Create a dummy prim and select it
             if self._dummy_prim_feature_on:
                 carb.log_info('Assets have loaded. Creating a dummy prim.')
@@ -394,10 +526,61 @@ class StageManager:
                 payload = {"result": "error", "error": str(e)}
             else:
                 payload = {"result": "success", "error": ""}
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("resetStageResponse")
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+            self._outbox.send("resetStageResponse", payload)
+
+
+    def _on_load_assets(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `loadAssetsRequest` event.
+
+        Loads the payloads of the subtrees of the `asset_ids`. Assets loaded
+        on request stay loaded until an `unloadAssetsRequest`. Sends
+        `loadAssetsResponse` once the payloads are loaded.
+        """
+        if event.type == carb.events.type_from_string("loadAssetsRequest"):
+            asset_ids = list(event.payload.get_dict().get("asset_ids") or [])
+            asyncio.ensure_future(self._change_payloads_async(asset_ids, True))
+
+
+    def _on_unload_assets(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `unloadAssetsRequest` event.
+
+        Unloads the payloads of the subtrees of the `asset_ids`. Sends
+        `unloadAssetsResponse` once the payloads are unloaded.
+        """
+        if event.type == carb.events.type_from_string("unloadAssetsRequest"):
+            asset_ids = list(event.payload.get_dict().get("asset_ids") or [])
+            asyncio.ensure_future(self._change_payloads_async(asset_ids, False))
+
+
+    async def _change_payloads_async(self, asset_ids: typing.List[str], is_load: bool) -> None:
+        """Load or unload the assets with the next payload batch and send the response."""
+        event_name = "loadAssetsResponse" if is_load else "unloadAssetsResponse"
+        resolved = []
+        prim_paths = []
+        failures = []
+        for asset_id in dict.fromkeys(asset_ids):
+            prim_path = self._asset_index.get_prim_path(asset_id)
+            if prim_path:
+                resolved.append(asset_id)
+                prim_paths.append(prim_path)
+            else:
+                failures.append(
+                    {DATA_ATTRIBUTE_NAME: asset_id, "error": f"No prim path found for {DATA_ATTRIBUTE_NAME}"}
+                )
+        carb.log_info(f"Received message to {'load' if is_load else 'unload'} {len(prim_paths)} assets.")
+
+        try:
+            if is_load:
+                await self._payloads.load(prim_paths)
+            else:
+                await self._payloads.unload(prim_paths)
+        except Exception as e:
+            payload = {"result": "error", "error": str(e), "asset_ids": [], "failures": failures}
+        else:
+            payload = {"result": "success", "error": "", "asset_ids": resolved, "failures": failures}
+        self._outbox.send(event_name, payload)
 
 
     def _on_make_pickable(self, event: carb.events.IEvent):
@@ -405,28 +588,28 @@ class StageManager:
         Handler for `makePrimsPickable` event.
 
         Enables viewport selection for the provided primitives.
+        `paths` replaces the pick-able primitives, while `add` and `remove`
+        change them incrementally. Only the difference with the current
+        pick-able primitives is applied.
         Sends 'makePrimsPickableResponse' back to streamer with
         current success status.
         """
         if event.type == carb.events.type_from_string("makePrimsPickable"):
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string(
-                "makePrimsPickableResponse"
-            )
-            # Reset the stage to not be pick-able.
-            context = omni.usd.get_context()
-            context.set_pickable("/", False)
-            # Set the provided paths to be pick-able.
             try:
-                paths = event.payload['paths'] or []
-                for path in paths:
-                    context.set_pickable(path, True)
+                request = event.payload.get_dict()
+                # Client requests supersede the pick-able prims being applied.
+                self._scheduler.cancel("pickability")
+                if "add" in request or "remove" in request:
+                    self._pickability.make_unpickable(request.get("remove") or [])
+                    self._pickability.make_pickable(request.get("add") or [])
+                else:
+                    # Set the provided paths to be the only pick-able ones.
+                    self._pickability.set_pickable_paths(request['paths'] or [])
             except Exception as e:
                 payload = {"result": "error", "error": str(e)}
             else:
                 payload = {"result": "success", "error": ""}
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+            self._outbox.send("makePrimsPickableResponse", payload)
 
 
     def _create_dummy_prim(self) -> str:
@@ -446,31 +629,79 @@ class StageManager:
 
     def _select_dummy_prim(self) -> None:
         """
-        Indicate that the dummy prim is being selected and select it.
-        Delay indication of it being selected so that selection event
-        handlers can trigger while it is being indicated as selected.
-        :return:
+        Add the dummy prim to the current selection.
         """
-        # Skip if something is already selected
-        context = omni.usd.get_context()
-        selection = context.get_selection().get_selected_prim_paths()
-        if not self._dummy_prim_path:
-            self._dummy_prim_path = self._create_dummy_prim()
-        if self._dummy_prim_path in selection:
-            carb.log_info('Dummy prim verified as being selected.')
-            return
-        carb.log_info('Adding dummy prim to selection.')
-        self._is_selecting_dummy_prim = True
-        selection.append(self._dummy_prim_path)
+        selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+        self._set_selection(selection)
+
+
+    def _set_selection(self, prim_paths: typing.List[str]) -> None:
+        """
+        Select `prim_paths`, along with the dummy prim, in a single change.
+        The resulting selection event is recognized and skipped.
+        """
+        prim_paths = list(prim_paths)
+        if self._dummy_prim_feature_on:
+            if not self._dummy_prim_path:
+                self._dummy_prim_path = self._create_dummy_prim()
+            if self._dummy_prim_path not in prim_paths:
+                prim_paths.append(self._dummy_prim_path)
+
+        self._applied_selection = frozenset(prim_paths)
         sel = omni.usd.get_context().get_selection()
-        sel.clear_selected_prim_paths()
-        carb.log_info(f"Changing selection: {selection}.")
-        sel.set_selected_prim_paths(selection, True)
-        async def reset():
-            await omni.kit.app.get_app().next_update_async()
-            carb.log_info('setting self._is_selecting_dummy_prim to False')
-            self._is_selecting_dummy_prim = False
-        asyncio.ensure_future(reset())
+        if frozenset(sel.get_selected_prim_paths()) == self._applied_selection:
+            return
+        carb.log_info(f"Changing selection: {prim_paths}.")
+        sel.set_selected_prim_paths(prim_paths, True)
+
+
+    async def _resolve_selection(self) -> None:
+        """
+        Resolve the viewport selection once per frame: select the tagged
+        assets owning the selected prims, along with the dummy prim, and
+        notify the client with a single `stageSelectionChanged`.
+        """
+        if self._is_selection_pending:
+            return
+        self._is_selection_pending = True
+        await omni.kit.app.get_app().next_update_async()
+        self._is_selection_pending = False
+
+        selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+        if frozenset(selection) == self._applied_selection:
+            # A client request applied its selection in the meantime.
+            return
+
+        # Get prim paths for prims that has a given attribute name,
+        # the selected prim itself or one of its ancestors.
+        new_selection = []
+        for o in selection:
+            path = self._asset_index.get_owning_prim_path(o)
+            if path is not None:
+                new_selection.append(path)
+        # Remove duplicate paths.
+        new_selection = list(dict.fromkeys(new_selection))
+        self._set_selection(new_selection)
+        # Assets selected in the viewport are in use, they are evicted last.
+        self._payloads.touch(new_selection)
+
+        # Create a list of fabric ids since that is what the client manages selection by.
+        selected_asset_ids = [self._asset_index.get_asset_id(o) for o in new_selection]
+
+        # Notify client about selection change
+        carb.log_info(f"Selection changed: Sending selected {DATA_ATTRIBUTE_NAME}s to client: {selected_asset_ids}")
+        self._notify_selection(selected_asset_ids)
+
+
+    def _reset_children_cache(self, stage: typing.Union[Usd.Stage, None]) -> None:
+        """Empty the children cache and listen to the changes of `stage`."""
+        carb.log_info(f"Resetting children cache: {self.children_cache_stats}")
+        self._children_cache.clear()
+        if self._stage_listener:
+            self._stage_listener.Revoke()
+            self._stage_listener = None
+        if stage:
+            self._stage_listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
 
 
     def on_shutdown(self):
@@ -478,7 +709,12 @@ class StageManager:
         to clean up the extension state."""
         # Reseting the state.
         self._subscriptions.clear()
-        self._is_external_update = False
+        self._scheduler.cancel("pickability")
+        self._scheduler.cancel("getChildren")
+        self._reset_children_cache(None)
         self._camera_attrs.clear()
         self._dummy_prim_path = ''
-        self._is_selecting_dummy_prim = False
+        self._applied_selection = frozenset()
+        self._is_selection_pending = False
+        self._notified_asset_ids = []
+        self._is_selection_delta_mode = False
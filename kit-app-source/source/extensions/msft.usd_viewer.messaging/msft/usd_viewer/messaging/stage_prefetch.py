@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import concurrent.futures
+import time
+import typing
+
+from pxr import Sdf
+
+import carb
+import carb.settings
+
+ENABLED_SETTING = "/exts/msft.usd_viewer.messaging/prefetch/enabled"
+MAX_WORKERS_SETTING = "/exts/msft.usd_viewer.messaging/prefetch/max_workers"
+MAX_LAYERS_SETTING = "/exts/msft.usd_viewer.messaging/prefetch/max_layers"
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_LAYERS = 4096
+
+# Called with the number of layers processed and discovered so far.
+ProgressCallback = typing.Callable[[int, int], None]
+
+
+def get_layer_dependencies(layer: Sdf.Layer) -> typing.List[str]:
+    """Return the absolute identifiers of the sublayers, references and payloads of `layer`."""
+    if hasattr(layer, "GetCompositionAssetDependencies"):
+        asset_paths = layer.GetCompositionAssetDependencies()
+    else:
+        asset_paths = layer.GetExternalReferences()
+    return [layer.ComputeAbsolutePath(o) for o in asset_paths if o]
+
+
+def _fetch_layer(identifier: str) -> typing.Tuple[typing.Union[Sdf.Layer, None], typing.List[str], str]:
+    """Open the layer at `identifier` and list its dependencies. Runs on a worker thread."""
+    try:
+        layer = Sdf.Layer.FindOrOpen(identifier)
+    except Exception as e:
+        return None, [], str(e)
+    if not layer:
+        return None, [], f"Failed to open layer '{identifier}'"
+    return layer, get_layer_dependencies(layer), ""
+
+
+class LayerPrefetcher:
+    """
+    Opens the layer dependency graph of a stage concurrently before the
+    stage itself is opened.
+
+    Layers are opened on a thread pool as their dependencies are discovered,
+    breadth first. The opened layers are held until `release` so composing
+    the stage finds them in the layer registry instead of fetching them one
+    at a time.
+    """
+    def __init__(self, max_workers: typing.Union[int, None] = None, max_layers: typing.Union[int, None] = None):
+        settings = carb.settings.get_settings()
+        if max_workers is None:
+            max_workers = settings.get_as_int(MAX_WORKERS_SETTING) or DEFAULT_MAX_WORKERS
+        if max_layers is None:
+            max_layers = settings.get_as_int(MAX_LAYERS_SETTING) or DEFAULT_MAX_LAYERS
+        self._max_layers: int = max_layers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="msft.usd_viewer.messaging prefetch"
+        )
+        self._layers: typing.List[Sdf.Layer] = []
+
+    @property
+    def layers(self) -> typing.List[Sdf.Layer]:
+        """The prefetched layers being held."""
+        return list(self._layers)
+
+    async def prefetch(self, url: str, on_progress: typing.Union[ProgressCallback, None] = None) -> typing.Dict:
+        """
+        Open the layer at `url` and all the layers it depends on.
+
+        Returns the number of `layers` opened, the `failures` as a map of
+        identifier to error, and the `elapsed_ms`. Failures don't stop the
+        prefetch, opening the stage reports them. Cancelling the prefetch
+        cancels the layers still queued, the ones already opened are held
+        until `release`.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        discovered = {url}
+        pending = {loop.run_in_executor(self._executor, _fetch_layer, url): url}
+        failures: typing.Dict[str, str] = {}
+        fetched = 0
+        is_truncated = False
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    identifier = pending.pop(future)
+                    layer, dependencies, error = future.result()
+                    if layer is None:
+                        carb.log_warn(f"Failed to prefetch '{identifier}': {error}")
+                        failures[identifier] = error
+                        continue
+                    self._layers.append(layer)
+                    fetched += 1
+                    for dependency in dependencies:
+                        if dependency in discovered:
+                            continue
+                        if len(discovered) >= self._max_layers:
+                            is_truncated = True
+                            break
+                        discovered.add(dependency)
+                        pending[loop.run_in_executor(self._executor, _fetch_layer, dependency)] = dependency
+                if on_progress:
+                    on_progress(fetched + len(failures), len(discovered))
+        finally:
+            # A cancelled prefetch stops fetching, only the layers being
+            # opened by a worker complete and are dropped.
+            for future in pending:
+                future.cancel()
+
+        if is_truncated:
+            carb.log_warn(f"Stopped discovering the layers of '{url}' after {self._max_layers} layers.")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        carb.log_info(f"Prefetched {fetched} layers of '{url}' in {elapsed_ms:.1f} ms, {len(failures)} failed.")
+        return {"layers": fetched, "failures": failures, "elapsed_ms": elapsed_ms}
+
+    def release(self) -> None:
+        """Drop the prefetched layers, the opened stage holds the ones it uses."""
+        self._layers.clear()
+
+    def on_shutdown(self) -> None:
+        """Release the layers and stop the worker threads."""
+        self.release()
+        self._executor.shutdown(wait=False)
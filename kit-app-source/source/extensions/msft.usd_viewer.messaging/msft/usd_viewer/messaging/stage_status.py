@@ -21,7 +21,7 @@
 import typing
 import asyncio
 
-from pxr import UsdGeom, Usd
+from pxr import Sdf, Tf, Usd
 
 import carb
 import carb.dictionary
@@ -34,6 +34,12 @@ import omni.usd
 import omni.kit.app
 import omni.kit.livestream.messaging as messaging
 
+from .asset_index import AssetIndex
+from .hierarchy import HierarchyWalker
+from .outbox import MessageOutbox
+from .payload_loading import PayloadManager
+from .scheduler import FrameScheduler, Work
+
 DATA_ATTRIBUTE_NAME = "asset_id"
 
 DEFAULT_SELECTION_OUTLINE_COLOR = carb.Float4([0, 0.635, 0.929, 1])
@@ -46,9 +52,25 @@ FAULT_SELECTION_SHADE_COLOR = carb.Float4([0.5, 0, 0.0, 0.7])
 
 class StatusManager:
     """This class manages the stage and its related events."""
-    def __init__(self):
+    def __init__(
+        self, asset_index: AssetIndex, outbox: MessageOutbox, scheduler: FrameScheduler, payloads: PayloadManager
+    ):
+        self._asset_index: AssetIndex = asset_index
+        self._outbox: MessageOutbox = outbox
+        self._scheduler: FrameScheduler = scheduler
+        self._payloads: PayloadManager = payloads
         self._asset_status_state: typing.Dict[str, str] = {}
         self._selection_groups_invalid: bool = False
+        # Prim paths whose status or selection membership changed since the
+        # selection groups were last applied, consumed by a scheduled task.
+        self._dirty_prim_paths: typing.Set[str] = set()
+        self._selected_prim_paths: typing.Set[str] = set()
+        self._needs_full_rebuild: bool = True
+
+        # Colorable descendant paths per statused asset root, invalidated
+        # by USD change notices for the subtrees they cover.
+        self._descendant_paths: typing.Dict[str, typing.Tuple[str, ...]] = {}
+        self._stage_listener = None
 
         # Internal messaging state
         self._subscriptions = []
@@ -57,7 +79,10 @@ class StatusManager:
         self._fault_selection_group: int = -1
 
         # -- register outgoing events/messages
-        outgoing = []
+        outgoing = [
+            # response to request to set the status of many prims
+            "setStatusBatchResponse",
+        ]
 
         for o in outgoing:
             messaging.register_event_type_to_send(o)
@@ -66,6 +91,8 @@ class StatusManager:
         incoming = {
             # request to set status of a prim
             'setStatusRequest': self._on_set_status,
+            # request to set status of many prims in a single message
+            'setStatusBatchRequest': self._on_set_status_batch,
         }
 
         for event_type, handler in incoming.items():
@@ -82,12 +109,37 @@ class StatusManager:
 
     def _on_stage_event(self, event):
         if event.type == int(omni.usd.StageEventType.SELECTION_CHANGED):
-            asyncio.ensure_future(self._invalidate_selection_groups())
+            selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+            selected_prim_paths = set(selection)
+            # Only statused prims are colored per selection membership.
+            changed = (selected_prim_paths ^ self._selected_prim_paths).intersection(self._asset_status_state)
+            self._selected_prim_paths = selected_prim_paths
+            if changed:
+                self._dirty_prim_paths.update(changed)
+                asyncio.ensure_future(self._invalidate_selection_groups())
+            return
+
+        if event.type == int(omni.usd.StageEventType.OPENED):
+            self._revoke_stage_listener()
+            stage = omni.usd.get_context().get_stage()
+            if stage:
+                self._stage_listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+            return
+
+        if event.type == int(omni.usd.StageEventType.CLOSED):
+            self._revoke_stage_listener()
+            self._descendant_paths.clear()
             return
 
         if event.type == int(omni.usd.StageEventType.OPENING):
             self._asset_status_state = {}
             self._selection_groups_invalid = False
+            self._dirty_prim_paths.clear()
+            self._selected_prim_paths.clear()
+            self._needs_full_rebuild = True
+            self._scheduler.cancel("selectionGroups")
+            self._revoke_stage_listener()
+            self._descendant_paths.clear()
             usd_context = omni.usd.get_context()
             if self._default_selection_group < 0:
                 self._default_selection_group = usd_context.register_selection_group()
@@ -127,62 +179,78 @@ class StatusManager:
 
             return
 
-    def _get_prim_path(self, asset_id):
-        stage = omni.usd.get_context().get_stage()
-        for prim in stage.Traverse():
-            # Check if the prim has the specified attribute
-            if prim.HasAttribute(DATA_ATTRIBUTE_NAME):
-                # Get the attribute object
-                attribute = prim.GetAttribute(DATA_ATTRIBUTE_NAME)
-
-                # Get the current value of the attribute
-                attribute_value = attribute.Get()
-
-                # Check if the value matches the desired value
-                if attribute_value == asset_id:
-                    return prim.GetPath().pathString
+    def _revoke_stage_listener(self) -> None:
+        if self._stage_listener:
+            self._stage_listener.Revoke()
+            self._stage_listener = None
 
+    def _on_objects_changed(self, notice: Usd.Notice.ObjectsChanged, stage: Usd.Stage) -> None:
+        """Drop the cached descendants of every asset whose subtree was resynced."""
+        if not self._descendant_paths:
+            return
+        invalidated = set()
+        for path in Sdf.Path.RemoveDescendentPaths(notice.GetResyncedPaths()):
+            # Property changes don't change which descendants are colorable.
+            if path.IsPropertyPath():
+                continue
+            # The resynced prim itself or one of its ancestors is a cached root...
+            for prefix in path.GetPrefixes():
+                if prefix.pathString in self._descendant_paths:
+                    invalidated.add(prefix.pathString)
+            # ...or cached roots live below the resynced prim.
+            prefix = path.pathString.rstrip("/") + "/"
+            invalidated.update(o for o in self._descendant_paths if o.startswith(prefix))
+
+        for prim_path in invalidated:
+            del self._descendant_paths[prim_path]
+        # Recolor the statused assets whose descendants may have changed.
+        invalidated.intersection_update(self._asset_status_state)
+        if invalidated:
+            self._dirty_prim_paths.update(invalidated)
+            asyncio.ensure_future(self._invalidate_selection_groups())
 
-    def _get_children(self, prim_path, filters=None, recursiveDepth=0):
-        """
-        Collect any children of the given `prim_path`, potentially filtered by `filters`
-        Returns flat list of children
+    def _get_descendant_paths(self, prim_path: str) -> typing.Tuple[str, ...]:
+        """Return the cached paths of the colorable descendants of `prim_path`."""
+        descendant_paths = self._descendant_paths.get(prim_path)
+        if descendant_paths is None:
+            stage = omni.usd.get_context().get_stage()
+            prim = stage.GetPrimAtPath(prim_path) if stage else None
+            walker = HierarchyWalker(filters=["USDGeom", "scope", "xform"], max_depth=5)
+            descendant_paths = tuple(o.GetPath().pathString for o, _ in walker.walk(prim)) if prim else ()
+            self._descendant_paths[prim_path] = descendant_paths
+        return descendant_paths
+
+    def set_statuses(self, statuses: typing.Dict[str, str]) -> typing.Dict[str, str]:
         """
-        if not prim_path:
-            return []
-        stage = omni.usd.get_context().get_stage()
-        prim = stage.GetPrimAtPath(prim_path)
-        if not prim:
-            return []
-
-        filter_types = {
-            "USDGeom": UsdGeom.Mesh,
-            "mesh": UsdGeom.Mesh,
-            "xform": UsdGeom.Xform,
-            "scope": UsdGeom.Scope,
-        }
-
-        children = []
-        for child in prim.GetChildren():
-            # If a child doesn't pass any filter, we skip it.
-            if filters is not None:
-                if not any(child.IsA(filter_types[filt]) for filt in filters if filt in filter_types):
-                    continue
+        Set the status of every asset in `statuses`, a map of asset id to status.
 
-            child_name = child.GetName()
-            # Skipping over cameras
-            if child_name.startswith('OmniverseKit_'):
+        All asset ids are resolved in a single pass and the selection groups
+        are invalidated once. Returns a map of asset id to error for the
+        assets whose status could not be set.
+        """
+        failures: typing.Dict[str, str] = {}
+        faulted: typing.List[str] = []
+        for asset_id, asset_status in statuses.items():
+            if not asset_id:
+                failures[asset_id] = f"Empty string for {DATA_ATTRIBUTE_NAME}"
                 continue
-            # Also skipping rendering primitives.
-            if prim_path == '/' and child_name == 'Render':
+            prim_path = self._asset_index.get_prim_path(asset_id)
+            if not prim_path:
+                failures[asset_id] = f"No prim path found for {DATA_ATTRIBUTE_NAME}"
                 continue
-            children.append(child)
+            if self._asset_status_state.get(prim_path) != asset_status:
+                self._asset_status_state[prim_path] = asset_status
+                self._dirty_prim_paths.add(prim_path)
+                if asset_status == 'fault':
+                    faulted.append(prim_path)
 
-            if child.GetChildren() and recursiveDepth > 0:
-                if recursiveDepth > 0:
-                    children.extend(self._get_children(prim_path=child.GetPath().pathString, filters=filters, recursiveDepth=recursiveDepth-1))
+        # Faulted assets stream in on demand in auto mode.
+        if faulted and self._payloads.is_auto:
+            self._payloads.load(faulted, pinned=False)
 
-        return children
+        if self._dirty_prim_paths:
+            asyncio.ensure_future(self._invalidate_selection_groups())
+        return failures
 
 
     def _on_set_status(self, event: carb.events.IEvent) -> None:
@@ -194,14 +262,35 @@ class StatusManager:
 
             asset_status: str = event.payload['asset_status']
 
-            prim_path = self._get_prim_path(asset_id=asset_id)
-
-            if not prim_path:
+            if self.set_statuses({asset_id: asset_status}):
                 carb.log_warn(f"No prim path found for {DATA_ATTRIBUTE_NAME}: '{asset_id}'")
-                return
 
-            self._asset_status_state[prim_path] = asset_status
-            asyncio.ensure_future(self._invalidate_selection_groups())
+
+    def _on_set_status_batch(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `setStatusBatchRequest` event.
+
+        Accepts `statuses` either as a map of asset id to status or as a list
+        of `{asset_id, asset_status}` entries. Sends `setStatusBatchResponse`
+        listing the asset ids that failed.
+        """
+        if event.type == carb.events.type_from_string("setStatusBatchRequest"):
+            try:
+                statuses = event.payload.get_dict().get("statuses") or {}
+                if not isinstance(statuses, dict):
+                    statuses = {o[DATA_ATTRIBUTE_NAME]: o['asset_status'] for o in statuses}
+                failures = self.set_statuses(statuses)
+            except Exception as e:
+                payload = {"result": "error", "error": str(e), "failures": []}
+            else:
+                carb.log_info(f"Set the status of {len(statuses) - len(failures)} of {len(statuses)} assets.")
+                payload = {
+                    "result": "success",
+                    "error": "",
+                    # A list is used since carb dictionary keys can't hold every asset id, e.g. ids with '/'.
+                    "failures": [{DATA_ATTRIBUTE_NAME: k, "error": v} for k, v in failures.items()],
+                }
+            self._outbox.send("setStatusBatchResponse", payload)
 
 
     async def _invalidate_selection_groups(self):
@@ -209,25 +298,41 @@ class StatusManager:
             return
         self._selection_groups_invalid = True
         await omni.kit.app.get_app().next_update_async()
-        self._validate_selection_groups()
-
-
-    def _validate_selection_groups(self) -> None:
         if not self._selection_groups_invalid:
             return
         self._selection_groups_invalid = False
+        # A running task is superseded, the new one resumes its dirty paths.
+        self._scheduler.cancel("selectionGroups")
+        self._scheduler.submit(self._validate_selection_groups(), name="selectionGroups")
 
+
+    def _validate_selection_groups(self) -> Work:
+        """Apply the selection groups of the dirty prims, yielding after each prim."""
         if self._fault_selection_group < 0 or self._warning_selection_group < 0:
             return
 
-        for prim_path, status in self._asset_status_state.items():
-            self._set_selection_group(prim_path, status)
+        # Only prims that changed since the last validation are re-applied,
+        # except after a stage has opened.
+        if self._needs_full_rebuild:
+            self._needs_full_rebuild = False
+            self._dirty_prim_paths.update(self._asset_status_state)
+
+        selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+        self._selected_prim_paths = set(selection)
+        applied = 0
+        # Paths dirtied meanwhile are applied by this same task.
+        while self._dirty_prim_paths:
+            prim_path = self._dirty_prim_paths.pop()
+            if prim_path not in self._asset_status_state:
+                continue
+            self._set_selection_group(prim_path, self._asset_status_state[prim_path])
+            applied += 1
+            yield applied / (applied + len(self._dirty_prim_paths))
 
     def _set_selection_group(self, prim_path: str, status: str) -> None:
         carb.log_info(f"Setting selection group for {prim_path}: {status}")
         usd_context = omni.usd.get_context()
-        selected_prim_paths = usd_context.get_selection().get_selected_prim_paths()
-        selection_group = self._default_selection_group if prim_path in selected_prim_paths else 0
+        selection_group = self._default_selection_group if prim_path in self._selected_prim_paths else 0
         if status == 'warning':
             selection_group = self._warning_selection_group
         elif status == 'fault':
@@ -235,15 +340,10 @@ class StatusManager:
 
         usd_context.set_selection_group(selection_group, prim_path)
 
-        children = self._get_children(
-            prim_path=prim_path,
-            filters=["USDGeom", "scope", "xform"],
-            recursiveDepth=5
-        )
-
-        for child in children:
-            carb.log_info(f"Setting selection group for child {child.GetPath().pathString}: {status}")
-            usd_context.set_selection_group(selection_group, child.GetPath().pathString)
+        descendant_paths = self._get_descendant_paths(prim_path)
+        carb.log_info(f"Setting selection group for {len(descendant_paths)} children of {prim_path}: {status}")
+        for child_path in descendant_paths:
+            usd_context.set_selection_group(selection_group, child_path)
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated. It is used
@@ -252,3 +352,8 @@ class StatusManager:
         self._subscriptions.clear()
         self._asset_status_state = {}
         self._selection_groups_invalid = False
+        self._dirty_prim_paths.clear()
+        self._selected_prim_paths.clear()
+        self._scheduler.cancel("selectionGroups")
+        self._revoke_stage_listener()
+        self._descendant_paths.clear()
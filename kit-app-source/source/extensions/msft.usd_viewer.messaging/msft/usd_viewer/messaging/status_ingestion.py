@@ -0,0 +1,360 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import abc
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import typing
+
+import carb
+import carb.events
+import carb.settings
+import omni.kit.app
+
+from .stage_status import DATA_ATTRIBUTE_NAME, StatusManager
+
+SOURCE_SETTING = "/exts/msft.usd_viewer.messaging/status_ingestion/source"
+PATH_SETTING = "/exts/msft.usd_viewer.messaging/status_ingestion/path"
+HOST_SETTING = "/exts/msft.usd_viewer.messaging/status_ingestion/host"
+PORT_SETTING = "/exts/msft.usd_viewer.messaging/status_ingestion/port"
+BUDGET_SETTING = "/exts/msft.usd_viewer.messaging/status_ingestion/budget_ms"
+
+DEFAULT_BUDGET_MS = 2.0
+# Number of statuses applied between two checks of the frame budget.
+CHUNK_SIZE = 256
+# Seconds a source blocks waiting for updates, bounds how long stopping takes.
+READ_TIMEOUT = 0.1
+
+StatusUpdate = typing.Tuple[str, str]
+
+
+def parse_status_updates(text: str) -> typing.Tuple[typing.List[StatusUpdate], int]:
+    """
+    Parse JSON lines of `{asset_id, asset_status}` objects, or lists of them.
+
+    Returns the updates and the number of malformed lines.
+    """
+    updates: typing.List[StatusUpdate] = []
+    malformed = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries = json.loads(line)
+            if isinstance(entries, dict):
+                entries = [entries]
+            updates.extend((str(o[DATA_ATTRIBUTE_NAME]), str(o["asset_status"])) for o in entries)
+        except (ValueError, TypeError, KeyError):
+            malformed += 1
+    return updates, malformed
+
+
+class StatusSource(abc.ABC):
+    """
+    A feed of status updates, read from the ingestion thread.
+
+    `read` blocks for at most `timeout` seconds and returns the updates
+    received meanwhile, possibly none.
+    """
+    malformed: int = 0
+
+    @abc.abstractmethod
+    def read(self, timeout: float) -> typing.List[StatusUpdate]:
+        """Return the updates received within `timeout` seconds."""
+
+    def close(self) -> None:
+        pass
+
+
+class QueueStatusSource(StatusSource):
+    """Status updates put by other components of the process."""
+    def __init__(self):
+        self._queue: "queue.Queue[StatusUpdate]" = queue.Queue()
+
+    def put(self, asset_id: str, asset_status: str) -> None:
+        """Queue a status update, may be called from any thread."""
+        self._queue.put((asset_id, asset_status))
+
+    def read(self, timeout: float) -> typing.List[StatusUpdate]:
+        try:
+            updates = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        # Drain whatever else is already queued without blocking.
+        try:
+            while True:
+                updates.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return updates
+
+
+class FileTailStatusSource(StatusSource):
+    """
+    Status updates appended as JSON lines to a file. Only lines written
+    after the source opened are read, the file is reopened when truncated.
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+        self._partial_line = ""
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self._path, "r", encoding="utf-8")
+        except OSError:
+            return False
+        self._file.seek(0, os.SEEK_END)
+        self._partial_line = ""
+        return True
+
+    def read(self, timeout: float) -> typing.List[StatusUpdate]:
+        if self._file is None and not self._open():
+            time.sleep(timeout)
+            return []
+        try:
+            if os.path.getsize(self._path) < self._file.tell():
+                carb.log_info(f"Status file '{self._path}' was truncated, reading from its start.")
+                self._file.seek(0)
+                self._partial_line = ""
+        except OSError:
+            pass
+
+        text = self._file.read()
+        if not text:
+            time.sleep(timeout)
+            return []
+        # Keep an incomplete last line until the rest of it is written.
+        text = self._partial_line + text
+        text, _, self._partial_line = text.rpartition("\n")
+        updates, malformed = parse_status_updates(text)
+        self.malformed += malformed
+        return updates
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class UdpStatusSource(StatusSource):
+    """Status updates received as JSON lines in UDP datagrams."""
+    def __init__(self, host: str, port: int):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+
+    @property
+    def address(self) -> typing.Tuple[str, int]:
+        """The address the source listens on."""
+        return self._socket.getsockname()
+
+    def read(self, timeout: float) -> typing.List[StatusUpdate]:
+        self._socket.settimeout(timeout)
+        try:
+            data, _ = self._socket.recvfrom(65535)
+        except socket.timeout:
+            return []
+        except OSError:
+            # The socket was closed while waiting.
+            return []
+        updates, malformed = parse_status_updates(data.decode("utf-8", errors="replace"))
+        self.malformed += malformed
+        return updates
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+def create_status_source() -> typing.Union[StatusSource, None]:
+    """Create the status source configured in the extension settings, None if there is none."""
+    settings = carb.settings.get_settings()
+    source = settings.get_as_string(SOURCE_SETTING)
+    if not source:
+        return None
+    if source == "queue":
+        return QueueStatusSource()
+    if source == "file":
+        return FileTailStatusSource(settings.get_as_string(PATH_SETTING))
+    if source == "udp":
+        host = settings.get_as_string(HOST_SETTING) or "127.0.0.1"
+        port = settings.get_as_int(PORT_SETTING)
+        try:
+            return UdpStatusSource(host, port)
+        except OSError as e:
+            carb.log_error(f"Failed to listen for statuses on {host}:{port}: {e}")
+            return None
+    carb.log_error(f"Unknown status ingestion source '{source}'.")
+    return None
+
+
+class StatusIngestion:
+    """
+    Reads status updates from a `StatusSource` on a background thread and
+    applies them to the `StatusManager` on the main thread.
+
+    Updates are coalesced per asset id, the last one wins. Each frame the
+    pending statuses are applied in chunks until `budget_ms` is spent, the
+    remaining ones wait for the next frame.
+    """
+    def __init__(self, status_manager: StatusManager, budget_ms: typing.Union[float, None] = None):
+        self._status_manager: StatusManager = status_manager
+        if budget_ms is None:
+            budget_ms = carb.settings.get_settings().get_as_float(BUDGET_SETTING) or DEFAULT_BUDGET_MS
+        self._budget_ms: float = budget_ms
+        self._source: typing.Union[StatusSource, None] = None
+        self._thread: typing.Union[threading.Thread, None] = None
+        self._stop_event = threading.Event()
+
+        # Pending status per asset id, shared with the ingestion thread.
+        self._lock = threading.Lock()
+        self._pending: typing.Dict[str, str] = {}
+        # Statuses taken from `_pending` at once and applied by chunks from
+        # the main thread, starting at `_backlog_start`.
+        self._backlog: typing.List[typing.Tuple[str, str]] = []
+        self._backlog_start: int = 0
+
+        # Counters
+        self._received: int = 0
+        self._coalesced: int = 0
+        self._applied: int = 0
+        self._unresolved: int = 0
+        self._deferred_frames: int = 0
+
+        self._subscription = None
+
+    @property
+    def source(self) -> typing.Union[StatusSource, None]:
+        """The source being read, None when stopped."""
+        return self._source
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Status counters. `coalesced` counts updates superseded before being
+        applied, `unresolved` the statuses of unknown asset ids and
+        `deferred_frames` the frames that ran out of budget.
+        """
+        with self._lock:
+            return {
+                "received": self._received,
+                "coalesced": self._coalesced,
+                "applied": self._applied,
+                "unresolved": self._unresolved,
+                "malformed": self._source.malformed if self._source else 0,
+                "deferred_frames": self._deferred_frames,
+                "pending": len(self._pending) + len(self._backlog) - self._backlog_start,
+            }
+
+    def start(self, source: StatusSource) -> None:
+        """Start reading `source` and applying its updates every frame."""
+        self.stop()
+        self._source = source
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="msft.usd_viewer.messaging status ingestion", daemon=True
+        )
+        self._thread.start()
+        self._subscription = omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+            self._on_update, name="msft.usd_viewer.messaging status ingestion"
+        )
+        carb.log_info(f"Ingesting statuses from {type(source).__name__} with a {self._budget_ms} ms budget per frame.")
+
+    def stop(self) -> None:
+        """Stop reading the source. Pending statuses are discarded."""
+        self._subscription = None
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        if self._source:
+            self._source.close()
+            self._source = None
+        with self._lock:
+            self._pending.clear()
+            self._backlog = []
+            self._backlog_start = 0
+
+    def _run(self) -> None:
+        source = self._source
+        while not self._stop_event.is_set():
+            try:
+                updates = source.read(READ_TIMEOUT)
+            except Exception as e:
+                carb.log_error(f"Failed to read statuses: {e}")
+                self._stop_event.wait(READ_TIMEOUT)
+                continue
+            if not updates:
+                continue
+            with self._lock:
+                for asset_id, asset_status in updates:
+                    if asset_id in self._pending:
+                        self._coalesced += 1
+                    self._pending[asset_id] = asset_status
+                self._received += len(updates)
+
+    def apply_pending(self, budget_ms: typing.Union[float, None] = None) -> int:
+        """
+        Apply pending statuses until `budget_ms` is spent, at least one chunk
+        is applied. Returns the number of statuses applied.
+        """
+        budget = (self._budget_ms if budget_ms is None else budget_ms) / 1000
+        start = time.perf_counter()
+        applied = 0
+        while True:
+            if self._backlog_start >= len(self._backlog):
+                # Everything received is taken at once, the reader thread
+                # only waits for the swap.
+                with self._lock:
+                    if not self._pending:
+                        self._backlog = []
+                        self._backlog_start = 0
+                        break
+                    self._backlog = list(self._pending.items())
+                    self._backlog_start = 0
+                    self._pending = {}
+            end = self._backlog_start + CHUNK_SIZE
+            # Newer statuses received meanwhile are applied after the backlog.
+            batch = dict(self._backlog[self._backlog_start:end])
+            self._backlog_start = end
+            failures = self._status_manager.set_statuses(batch)
+            applied += len(batch)
+            with self._lock:
+                self._applied += len(batch) - len(failures)
+                self._unresolved += len(failures)
+            if time.perf_counter() - start >= budget:
+                with self._lock:
+                    if self._pending or self._backlog_start < len(self._backlog):
+                        self._deferred_frames += 1
+                break
+        return applied
+
+    def _on_update(self, event: carb.events.IEvent) -> None:
+        self.apply_pending()
+
+    def on_shutdown(self) -> None:
+        """Stop the ingestion thread and close the source."""
+        self.stop()
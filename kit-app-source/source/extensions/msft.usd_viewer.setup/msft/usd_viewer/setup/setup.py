@@ -21,6 +21,7 @@
 import asyncio
 from pathlib import Path
 
+import carb
 import carb.settings
 import carb.tokens
 import omni.ext
@@ -32,17 +33,25 @@ import omni.client
 from omni.kit.mainwindow import get_main_window
 from omni.kit.quicklayout import QuickLayout
 from omni.kit.viewport.utility import get_viewport_from_window_name
+from msft.usd_viewer.messaging.load_policy import LoadPolicy
+from msft.usd_viewer.messaging.stage_prefetch import ENABLED_SETTING as PREFETCH_ENABLED_SETTING, LayerPrefetcher
 
+from .startup_profiler import ENABLED_SETTING as PROFILE_ENABLED_SETTING, PATH_SETTING as PROFILE_PATH_SETTING
+from .startup_profiler import StartupProfiler
 
-async def _load_layout(layout_file: str):
+AUTO_LOAD_POLICY_SETTING = "/exts/msft.usd_viewer.setup/auto_load"
+
+
+async def _load_layout(layout_file: str, profiler: StartupProfiler):
     """Loads a provided layout file and ensures the viewport is set to FILL."""
     await omni.kit.app.get_app().next_update_async()
-    QuickLayout.load_file(layout_file)
+    with profiler.phase("load_layout"):
+        QuickLayout.load_file(layout_file)
 
-    # Set viewport to FILL
-    viewport_api = get_viewport_from_window_name("Viewport")
-    if viewport_api and hasattr(viewport_api, "fill_frame"):
-        viewport_api.fill_frame = True
+        # Set viewport to FILL
+        viewport_api = get_viewport_from_window_name("Viewport")
+        if viewport_api and hasattr(viewport_api, "fill_frame"):
+            viewport_api.fill_frame = True
 
 
 class SetupExtension(omni.ext.IExt):
@@ -51,16 +60,30 @@ class SetupExtension(omni.ext.IExt):
         """This is called every time the extension is activated. It is used to
         set up the application and load the stage."""
         self._settings = carb.settings.get_settings()
+        self._profiler = StartupProfiler()
+        self._profiler.begin("extension_startup")
+        self._prefetcher = None
+        self._open_stage_task = None
+        self._load_layout_task = None
+        self._report_startup_task = None
 
         # get auto load stage name
         stage_url = self._settings.get_as_string("/app/auto_load_usd")
 
         if stage_url:
             stage_url = carb.tokens.get_tokens_interface().resolve(stage_url)
-            asyncio.ensure_future(self.__open_stage(stage_url))
+            try:
+                load_policy = LoadPolicy.from_dict(self._settings.get(AUTO_LOAD_POLICY_SETTING))
+            except (ValueError, TypeError, AttributeError) as e:
+                carb.log_error(f"Invalid auto load policy, loading the whole stage: {e}")
+                load_policy = LoadPolicy()
+            # Fetching the stage starts right away, in parallel with the layout.
+            self._open_stage_task = asyncio.ensure_future(self.__open_stage(stage_url, load_policy))
 
         self._await_layout = asyncio.ensure_future(self._delayed_layout())
         get_main_window().get_main_menu_bar().visible = False
+        self._profiler.end("extension_startup")
+        self._report_startup_task = asyncio.ensure_future(self._report_startup())
 
 
     async def _delayed_layout(self):
@@ -71,6 +94,7 @@ class SetupExtension(omni.ext.IExt):
         # few frame delay to allow automatic Layout of window that want their
         # own positions
         app = omni.kit.app.get_app()
+        self._profiler.begin("delayed_layout")
         for _ in range(4):
             await app.next_update_async()  # type: ignore
 
@@ -82,7 +106,7 @@ class SetupExtension(omni.ext.IExt):
         layout_name = settings.get("/app/layout/name")
         layout_file = Path(layouts_path).joinpath(f"{layout_name}.json")
 
-        asyncio.ensure_future(_load_layout(f"{layout_file}"))
+        self._load_layout_task = asyncio.ensure_future(_load_layout(f"{layout_file}", self._profiler))
 
         # using imgui directly to adjust some color and Variable
         imgui = _imgui.acquire_imgui()
@@ -90,15 +114,22 @@ class SetupExtension(omni.ext.IExt):
         # DockSplitterSize is the variable that drive the size of the
         # Dock Split connection
         imgui.push_style_var_float(_imgui.StyleVar.DockSplitterSize, 2)
-
-    async def __open_stage(self, url, frame_delay: int = 5):
-        """Opens the provided USD stage and loads the render settings."""
-        # default 5 frame delay to allow for Layout
-        if frame_delay:
-            app = omni.kit.app.get_app()
-            for _ in range(frame_delay):
-                await app.next_update_async()
-
+        self._profiler.end("delayed_layout")
+
+    async def _report_startup(self):
+        """Reports the startup timeline once the layout and the auto loaded stage are ready."""
+        tasks = [o for o in (self._await_layout, self._open_stage_task) if o]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._load_layout_task:
+            await asyncio.gather(self._load_layout_task, return_exceptions=True)
+        # The first frame rendered with the layout and the stage.
+        await omni.kit.app.get_app().next_update_async()
+        self._profiler.mark("first_frame")
+        if self._settings.get_as_bool(PROFILE_ENABLED_SETTING):
+            self._profiler.report(self._settings.get_as_string(PROFILE_PATH_SETTING))
+
+    def __register_sas_token(self, url: str) -> str:
+        """Registers the Azure SAS token of `url`, if any, and returns the URL without it."""
         client_url: omni.client.Url = omni.client.break_url_reference(url)
         file_url = url
 
@@ -117,18 +148,85 @@ class SetupExtension(omni.ext.IExt):
                     sas_token,
                     False
                 )
+        return file_url
+
+    async def __fetch_stage(self, file_url: str, load_policy: LoadPolicy):
+        """
+        Fetches the stage ahead of opening it. A masked stage is composed
+        entirely and returned, the layers of a fully loaded stage are
+        prefetched and held.
+        """
+        with self._profiler.phase("fetch_stage"):
+            if load_policy.population_mask:
+                # omni.usd can't open a masked stage, it's composed aside then attached.
+                return await asyncio.get_event_loop().run_in_executor(None, load_policy.open_masked, file_url)
+            # Prefetching would fetch the payloads the load policy leaves unloaded.
+            if load_policy.is_default and self._settings.get_as_bool(PREFETCH_ENABLED_SETTING):
+                self._prefetcher = LayerPrefetcher()
+                await self._prefetcher.prefetch(file_url)
+            return None
+
+    async def __open_stage(self, url, load_policy: LoadPolicy, frame_delay: int = 5):
+        """
+        Opens the provided USD stage per `load_policy` and loads the render settings.
+
+        The stage is fetched while the layout settles, only attaching it to
+        the USD context waits for the `frame_delay` frames.
+        """
+        with self._profiler.phase("sas_token"):
+            file_url = self.__register_sas_token(url)
+        fetch_task = asyncio.ensure_future(self.__fetch_stage(file_url, load_policy))
+
+        # default 5 frame delay to allow for Layout
+        if frame_delay:
+            app = omni.kit.app.get_app()
+            with self._profiler.phase("layout_wait"):
+                for _ in range(frame_delay):
+                    await app.next_update_async()
 
         usd_context = omni.usd.get_context()
-        await usd_context.open_stage_async(file_url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)
+        try:
+            try:
+                stage = await fetch_task
+            except Exception as e:
+                if load_policy.population_mask:
+                    carb.log_error(f"Failed to open '{file_url}': {e}")
+                    return
+                # Opening the stage fetches whatever the prefetch missed.
+                carb.log_warn(f"Failed to prefetch '{file_url}': {e}")
+                stage = None
+            with self._profiler.phase("open_stage"):
+                if stage:
+                    await usd_context.attach_stage_async(stage)
+                else:
+                    await usd_context.open_stage_async(file_url, load_policy.initial_load_set)
+        finally:
+            # The opened stage holds the prefetched layers it uses.
+            if self._prefetcher:
+                self._prefetcher.on_shutdown()
+                self._prefetcher = None
+        if not load_policy.is_default and usd_context.get_stage():
+            with self._profiler.phase("apply_load_policy"):
+                load_policy.apply(usd_context.get_stage())
 
         # If this was the first Usd data opened, explicitly restore
         # render-settings now as the renderer may not have been fully
         # setup when the stage was opened.
         if not bool(self._settings.get("/app/content/emptyStageOnStart")):
-            usd_context.load_render_settings_from_stage(
-                usd_context.get_stage_id())
+            with self._profiler.phase("load_render_settings"):
+                usd_context.load_render_settings_from_stage(
+                    usd_context.get_stage_id())
 
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated."""
-        return
+        if self._report_startup_task and not self._report_startup_task.done():
+            self._report_startup_task.cancel()
+        self._report_startup_task = None
+        self._profiler.on_shutdown()
+        if self._open_stage_task and not self._open_stage_task.done():
+            self._open_stage_task.cancel()
+        self._open_stage_task = None
+        if self._prefetcher:
+            self._prefetcher.on_shutdown()
+            self._prefetcher = None
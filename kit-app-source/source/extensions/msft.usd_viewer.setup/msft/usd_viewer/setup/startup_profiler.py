@@ -0,0 +1,181 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import asyncio
+import contextlib
+import json
+import os
+import re
+import time
+import typing
+
+import carb
+import carb.settings
+import carb.tokens
+import omni.ext
+import omni.kit.app
+
+ENABLED_SETTING = "/exts/msft.usd_viewer.setup/startup_profile/enabled"
+PATH_SETTING = "/exts/msft.usd_viewer.setup/startup_profile/path"
+
+# Kit log lines of extension startups, e.g.
+# `2024-10-24T10:00:00Z [2,345ms] [Info] [omni.ext.plugin] [ext: omni.kit.window.file-1.3.54] startup`
+EXTENSION_STARTUP_PATTERN = re.compile(r"\[([\d,.]+)ms\].*\[ext: ([^\]]+)\] startup")
+
+
+def parse_extension_startup_costs(lines: typing.Iterable[str]) -> typing.Dict[str, float]:
+    """
+    Return the startup cost in milliseconds of every extension found in
+    Kit log `lines`. Extensions start one after the other, an extension's
+    cost runs until the next one starts, so the last one has no cost.
+    """
+    starts: typing.List[typing.Tuple[str, float]] = []
+    for line in lines:
+        match = EXTENSION_STARTUP_PATTERN.search(line)
+        if match:
+            starts.append((match.group(2), float(match.group(1).replace(",", ""))))
+    return {ext_id: round(b - a, 3) for (ext_id, a), (_, b) in zip(starts, starts[1:])}
+
+
+class StartupProfiler:
+    """
+    Records the phases of the application startup as seconds since the
+    application started, and the startup cost of every extension.
+
+    Extensions started before the profiler are measured from the Kit log
+    file, the ones started after it through extension startup hooks.
+    """
+    def __init__(self):
+        app = omni.kit.app.get_app()
+        # Monotonic time of the application start.
+        self._origin: float = time.monotonic() - app.get_time_since_start_s()
+        self._phases: typing.Dict[str, typing.List[typing.Union[float, None]]] = {}
+        self._marks: typing.Dict[str, float] = {}
+        self._extension_starts: typing.Dict[str, float] = {}
+        self._extension_costs: typing.Dict[str, float] = {}
+        self._hooks = []
+
+        if hasattr(omni.ext, "ExtensionStateChangeType"):
+            hooks = app.get_extension_manager().get_hooks()
+            for change_type in (
+                omni.ext.ExtensionStateChangeType.BEFORE_EXTENSION_STARTUP,
+                omni.ext.ExtensionStateChangeType.AFTER_EXTENSION_STARTUP,
+            ):
+                self._hooks.append(hooks.create_extension_state_change_hook(
+                    self._on_extension_state_change, change_type, hook_name="msft.usd_viewer.setup startup profile"
+                ))
+
+    def now(self) -> float:
+        """Seconds since the application started."""
+        return time.monotonic() - self._origin
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Record the start and end of the phase `name` around the block."""
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def begin(self, name: str) -> None:
+        """Record the start of the phase `name`."""
+        self._phases[name] = [self.now(), None]
+
+    def end(self, name: str) -> None:
+        """Record the end of the phase `name`."""
+        if name in self._phases:
+            self._phases[name][1] = self.now()
+
+    def mark(self, name: str) -> None:
+        """Record an instant of the startup."""
+        self._marks[name] = self.now()
+
+    def _on_extension_state_change(self, ext_id: str, change_type) -> None:
+        if change_type == omni.ext.ExtensionStateChangeType.BEFORE_EXTENSION_STARTUP:
+            self._extension_starts[ext_id] = time.monotonic()
+        elif ext_id in self._extension_starts:
+            cost = (time.monotonic() - self._extension_starts.pop(ext_id)) * 1000
+            self._extension_costs[ext_id] = round(cost, 3)
+
+    def get_extension_costs(self) -> typing.Dict[str, float]:
+        """Return the startup cost in milliseconds of every extension, most expensive first."""
+        costs: typing.Dict[str, float] = {}
+        log_path = carb.settings.get_settings().get_as_string("/log/file")
+        if log_path:
+            try:
+                with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                    costs.update(parse_extension_startup_costs(f))
+            except OSError as e:
+                carb.log_info(f"Failed to read extension startups from '{log_path}': {e}")
+        # Hooks measure the startup itself, they're preferred over the log.
+        costs.update(self._extension_costs)
+        return dict(sorted(costs.items(), key=lambda o: o[1], reverse=True))
+
+    def get_timeline(self) -> dict:
+        """Return the phases, in start order, the marks and the extension startup costs."""
+        phases = []
+        for name, (start, end) in sorted(self._phases.items(), key=lambda o: o[1][0]):
+            phases.append({
+                "name": name,
+                "start_s": round(start, 6),
+                "end_s": round(end, 6) if end is not None else None,
+                "duration_ms": round((end - start) * 1000, 3) if end is not None else None,
+            })
+        return {
+            "phases": phases,
+            "marks": {k: round(v, 6) for k, v in sorted(self._marks.items(), key=lambda o: o[1])},
+            "extensions_ms": self.get_extension_costs(),
+        }
+
+    def report(self, path: typing.Union[str, None] = None) -> dict:
+        """
+        Log a summary of the timeline and write it as JSON to `path`,
+        tokens such as ${logs} are resolved. Returns the timeline.
+        """
+        timeline = self.get_timeline()
+        lines = [f"Startup timeline, {self.now():.3f} s since the application started:"]
+        for o in timeline["phases"]:
+            duration = f"{o['duration_ms']:10.1f} ms" if o["duration_ms"] is not None else "   unfinished"
+            lines.append(f"  {o['name']:<24} {o['start_s']:8.3f} s {duration}")
+        for name, at in timeline["marks"].items():
+            lines.append(f"  {name:<24} {at:8.3f} s")
+        extensions = list(timeline["extensions_ms"].items())
+        if extensions:
+            lines.append(f"Most expensive of {len(extensions)} extension startups:")
+            lines.extend(f"  {ext_id:<48} {cost:10.1f} ms" for ext_id, cost in extensions[:10])
+        carb.log_info("\n".join(lines))
+
+        if path:
+            path = carb.tokens.get_tokens_interface().resolve(path)
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                # Written aside then moved so readers never see a partial file.
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(timeline, f, indent=2)
+                os.replace(temp_path, path)
+            except OSError as e:
+                carb.log_error(f"Failed to write the startup timeline to '{path}': {e}")
+        return timeline
+
+    def on_shutdown(self) -> None:
+        """Stop measuring extension startups."""
+        self._hooks.clear()
@@ -76,3 +76,38 @@ class TestAppStartup(AsyncTestCase):
 
         fsd_enabled: bool = carb.settings.get_settings().get("/app/useFabricSceneDelegate")
         self.assertTrue(fsd_enabled)
+
+    async def test_l1_app_startup_timeline(self):
+        """Check the startup profiler writes the phases and extension startup costs"""
+        import tempfile
+        from pathlib import Path
+        from ..startup_profiler import StartupProfiler, parse_extension_startup_costs
+
+        costs = parse_extension_startup_costs([
+            "2024-10-24T10:00:00Z [1,000ms] [Info] [omni.ext.plugin] [ext: omni.kit.a-1.0.0] startup",
+            "2024-10-24T10:00:00Z [1,020ms] [Info] [carb] unrelated",
+            "2024-10-24T10:00:01Z [1,250ms] [Info] [omni.ext.plugin] [ext: omni.kit.b-1.0.0] startup",
+            "2024-10-24T10:00:01Z [1,300ms] [Info] [omni.ext.plugin] [ext: omni.kit.c-1.0.0] startup",
+        ])
+        self.assertEqual(costs, {"omni.kit.a-1.0.0": 250.0, "omni.kit.b-1.0.0": 50.0})
+
+        profiler = StartupProfiler()
+        try:
+            with profiler.phase("open_stage"):
+                await omni.kit.app.get_app().next_update_async()
+            profiler.begin("unfinished")
+            profiler.mark("first_frame")
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "startup_timeline.json"
+                profiler.report(str(path))
+                with open(path, "r") as f:
+                    timeline = json.load(f)
+        finally:
+            profiler.on_shutdown()
+
+        phases = {o["name"]: o for o in timeline["phases"]}
+        self.assertGreater(phases["open_stage"]["duration_ms"], 0)
+        self.assertLessEqual(phases["open_stage"]["end_s"], omni.kit.app.get_app().get_time_since_start_s())
+        self.assertIsNone(phases["unfinished"]["duration_ms"])
+        self.assertIn("first_frame", timeline["marks"])
+        self.assertIsInstance(timeline["extensions_ms"], dict)